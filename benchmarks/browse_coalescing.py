@@ -0,0 +1,71 @@
+"""Rapid "next page" taps against a fake Bot API, with and without coalescing.
+
+Run with ``python -m benchmarks.browse_coalescing``. The page render is
+replaced by a stub that sleeps for a simulated DB query and edit_media call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from bot.handlers import query
+
+
+DB_LATENCY = 0.02
+API_LATENCY = 0.05
+TAPS = 5
+TAP_INTERVAL = 0.08
+
+
+class FakeApi:
+    def __init__(self) -> None:
+        self.queries = 0
+        self.edits = 0
+
+    async def render(self, message, page: int, callback=None, mode: str = "browse") -> None:
+        self.queries += 1
+        await asyncio.sleep(DB_LATENCY)
+        self.edits += 1
+        await asyncio.sleep(API_LATENCY)
+        await callback.answer()
+
+
+def _callback(page: int):
+    async def answer(*args, **kwargs) -> None:
+        return None
+
+    message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=10)
+    return SimpleNamespace(data=f"browse:{page}", message=message, answer=answer)
+
+
+async def _tap_burst(handler) -> float:
+    started = time.perf_counter()
+    tasks = []
+    for tap in range(TAPS):
+        tasks.append(asyncio.create_task(handler(_callback(tap + 2), str(tap + 2))))
+        await asyncio.sleep(TAP_INTERVAL)
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    naive = FakeApi()
+
+    async def naive_handler(callback, payload: str) -> None:
+        await naive.render(callback.message, int(payload), callback)
+
+    naive_time = await _tap_burst(naive_handler)
+
+    coalesced = FakeApi()
+    query._send_browse_page = coalesced.render
+    coalesced_time = await _tap_burst(query.browse_callback)
+
+    print(f"{'mode':<12}{'db queries':>12}{'edit_media':>12}{'burst, ms':>12}")
+    print(f"{'naive':<12}{naive.queries:>12}{naive.edits:>12}{naive_time * 1000:>12.0f}")
+    print(f"{'coalesced':<12}{coalesced.queries:>12}{coalesced.edits:>12}{coalesced_time * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
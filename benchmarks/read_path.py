@@ -0,0 +1,110 @@
+"""ORM vs. Core read path: latency and allocations per rendered page.
+
+Run with ``python -m benchmarks.read_path``. Uses a temporary SQLite
+database through aiosqlite, so it needs no running Postgres.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from bot.db.models import Base, MediaContent, MediaTag, Tag
+from bot.db.reads import fetch_page
+
+
+ROWS = 5000
+TAGS_PER_ROW = 3
+PAGE_SIZE = 10
+PAGES = 200
+
+
+async def _seed(session: AsyncSession) -> None:
+    await session.execute(insert(Tag), [{"name": f"tag{i}"} for i in range(50)])
+    await session.execute(
+        insert(MediaContent),
+        [
+            {
+                "telegram_file_id": f"file{i}",
+                "telegram_file_unique_id": f"unique{i}",
+                "media_type": "photo",
+                "description": f"description {i} " * 5,
+                "is_approved": True,
+            }
+            for i in range(ROWS)
+        ],
+    )
+    await session.execute(
+        insert(MediaTag),
+        [
+            {"media_id": i + 1, "tag_id": (i + k) % 50 + 1}
+            for i in range(ROWS)
+            for k in range(TAGS_PER_ROW)
+        ],
+    )
+    await session.commit()
+
+
+async def _orm_page(session: AsyncSession, page: int) -> list:
+    result = await session.execute(
+        select(MediaContent)
+        .options(selectinload(MediaContent.tags))
+        .order_by(MediaContent.created_at.desc())
+        .offset(page * PAGE_SIZE)
+        .limit(PAGE_SIZE)
+    )
+    items = result.scalars().all()
+    return [(item.id, item.description, [tag.name for tag in item.tags]) for item in items]
+
+
+async def _core_page(session: AsyncSession, page: int) -> list:
+    items = await fetch_page(session, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+    return [(item.id, item.description, item.tags) for item in items]
+
+
+async def _measure(factory, render) -> tuple[float, float]:
+    started = time.perf_counter()
+    for page in range(PAGES):
+        # A fresh session per page, like the handlers.
+        async with factory() as session:
+            await render(session, page % (ROWS // PAGE_SIZE))
+    latency = (time.perf_counter() - started) / PAGES * 1000
+
+    tracemalloc.start()
+    peaks = []
+    for page in range(PAGES // 10):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        async with factory() as session:
+            await render(session, page)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+    return latency, sum(peaks) / len(peaks) / 1024
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            await _seed(session)
+
+        for name, render in (("orm", _orm_page), ("core", _core_page)):
+            await _measure(factory, render)
+            latency, peak = await _measure(factory, render)
+            print(f"{name:<6} {latency:8.2f} ms/page  peak {peak:7.1f} KiB/page")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
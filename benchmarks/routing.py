@@ -0,0 +1,98 @@
+"""Per-update routing overhead: chained lambda filters vs. dispatch tables.
+
+Run with ``python -m benchmarks.routing``. Needs no bot token or database.
+"""
+
+from __future__ import annotations
+
+import timeit
+from types import SimpleNamespace
+
+from bot.utils.dispatch import CallbackRoutes, TextRoutes
+
+
+MENU_TEXTS = [
+    "📤 Загрузить",
+    "🖼️ Лента",
+    "🔎 Список ID",
+    "🧾 Найти по ID",
+    "🏷️ Фильтр",
+    "🔤 Поиск",
+    "✏️ Редактировать",
+    "🗑️ Удалить",
+    "📚 Помощь",
+    "❌ Отменить",
+    "🏠 Меню",
+]
+CALLBACK_PREFIXES = ["browse", "show_id", "confirm_delete", "delete"]
+
+
+async def _noop(*args) -> None:
+    return None
+
+
+def _legacy_message_filters() -> list:
+    return [(lambda m, text=text: m.text == text) for text in MENU_TEXTS]
+
+
+def _legacy_callback_filters() -> list:
+    filters = [
+        (lambda c, prefix=prefix: c.data and c.data.startswith(f"{prefix}:"))
+        for prefix in CALLBACK_PREFIXES[:3]
+    ]
+    filters.append(lambda c: c.data == "delete_cancel")
+    filters.append(lambda c: c.data and c.data.startswith("delete:"))
+    return filters
+
+
+def _legacy_route_message(filters: list, message) -> int | None:
+    for index, check in enumerate(filters):
+        if check(message):
+            return index
+    return None
+
+
+def _legacy_route_callback(filters: list, callback) -> int | None:
+    for index, check in enumerate(filters):
+        if check(callback):
+            if ":" in callback.data:
+                int(callback.data.split(":", 1)[1])
+            return index
+    return None
+
+
+def main(number: int = 200_000) -> None:
+    text_routes = TextRoutes()
+    for text in MENU_TEXTS:
+        text_routes(text)(_noop)
+    callback_routes = CallbackRoutes()
+    for prefix in CALLBACK_PREFIXES + ["delete_cancel"]:
+        callback_routes(prefix)(_noop)
+
+    message_filters = _legacy_message_filters()
+    callback_filters = _legacy_callback_filters()
+
+    worst_message = SimpleNamespace(text=MENU_TEXTS[-1])
+    miss_message = SimpleNamespace(text="просто текст")
+    worst_callback = SimpleNamespace(data="delete:42")
+    browse_callback = SimpleNamespace(data="browse:7")
+
+    cases = [
+        ("message, last button", worst_message,
+         lambda m: _legacy_route_message(message_filters, m), text_routes.filter),
+        ("message, no match", miss_message,
+         lambda m: _legacy_route_message(message_filters, m), text_routes.filter),
+        ("callback, delete:", worst_callback,
+         lambda c: _legacy_route_callback(callback_filters, c), callback_routes.filter),
+        ("callback, browse:", browse_callback,
+         lambda c: _legacy_route_callback(callback_filters, c), callback_routes.filter),
+    ]
+    print(f"{'case':<24}{'before, ns':>12}{'after, ns':>12}{'speedup':>10}")
+    for name, update, before, after in cases:
+        before_ns = timeit.timeit(lambda: before(update), number=number) / number * 1e9
+        after_ns = timeit.timeit(lambda: after(update), number=number) / number * 1e9
+        print(f"{name:<24}{before_ns:>12.0f}{after_ns:>12.0f}{before_ns / after_ns:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Top-k "more like this" latency over a filled similarity matrix.
+
+Run with ``python -m benchmarks.similarity [items]``. Needs numpy, but no bot
+token or database; the matrix is filled with random unit vectors.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+import numpy as np
+
+from bot.similarity import DIMENSIONS, SimilarityIndex
+
+
+def main(items: int = 1_000_000, queries: int = 20) -> None:
+    index = SimilarityIndex()
+    vectors = np.random.default_rng(0).standard_normal((items, DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for media_id, vector in enumerate(vectors, start=1):
+        index.put(media_id, vector)
+
+    started = time.perf_counter()
+    for media_id in range(1, queries + 1):
+        index.similar(media_id, 10)
+    per_query = (time.perf_counter() - started) / queries * 1000
+    print(f"{items} items, {DIMENSIONS} dims: {per_query:.1f} ms per top-10 query")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
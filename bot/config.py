@@ -4,10 +4,33 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     bot_token: str
     database_url: str
+    database_read_url: str = ""
+    read_your_writes_seconds: float = 30.0
     download_files: bool = False
     download_path: str = "./downloads"
+    storage_quota_mb: int = 0
+    metadata_workers: int = 0
     moderation_enabled: bool = False
+    fast_start: bool = False
     admin_ids: str = ""
+    partitioning_enabled: bool = False
+    partition_months_ahead: int = 3
+    partition_archive_after_months: int = 0
+    throttle_browse_per_minute: int = 60
+    throttle_search_per_minute: int = 20
+    throttle_default_per_minute: int = 60
+    throttle_burst: int = 5
+    throttle_max_users: int = 10000
+    maintenance_interval_minutes: int = 60
+    maintenance_batch_size: int = 1000
+    rejected_retention_days: int = 0
+    retention_days: int = 0
+    retention_max_rows: int = 0
+    db_write_timeout_seconds: float = 3.0
+    spool_path: str = "./upload_spool.sqlite3"
+    spool_drain_interval_seconds: int = 30
+    view_flush_seconds: int = 60
+    similarity_path: str = ""
 
     model_config = SettingsConfigDict(
         env_file=(".env", "config/.env"),
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.dialect import id_in
+from bot.db.models import MediaArchive, MediaContent, MediaTag, Tag
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_COLUMNS = (
+    MediaContent.id,
+    MediaContent.telegram_file_id,
+    MediaContent.telegram_file_unique_id,
+    MediaContent.media_type,
+    MediaContent.description,
+    MediaContent.created_at,
+    MediaContent.is_approved,
+    MediaContent.local_path,
+)
+
+
+async def copy_to_archive(session: AsyncSession, ids: list[int]) -> tuple[list[int], list[str]]:
+    # Returns the ids copied into media_content_archive and their local paths.
+    # An id that is already archived is skipped, never overwritten: on SQLite
+    # tables created before AUTOINCREMENT a live row may reuse an archived id.
+    taken = set(
+        (await session.execute(select(MediaArchive.id).where(id_in(session, MediaArchive.id, ids)))).scalars()
+    )
+    if taken:
+        logger.warning("Media ids %s are already archived, keeping them live", sorted(taken))
+    wanted = [media_id for media_id in ids if media_id not in taken]
+    if not wanted:
+        return [], []
+
+    rows = (
+        await session.execute(select(*ARCHIVED_COLUMNS).where(id_in(session, MediaContent.id, wanted)))
+    ).all()
+    tag_rows = await session.execute(
+        select(MediaTag.media_id, Tag.name)
+        .join(Tag, Tag.id == MediaTag.tag_id)
+        .where(id_in(session, MediaTag.media_id, wanted))
+    )
+    tags: dict[int, list[str]] = {}
+    for media_id, name in tag_rows:
+        tags.setdefault(media_id, []).append(name)
+
+    values = []
+    local_paths = []
+    for row in rows:
+        record = row._asdict()
+        local_path = record.pop("local_path")
+        if local_path:
+            local_paths.append(local_path)
+        record["tag_names"] = " ".join(sorted(tags.get(row.id, [])))
+        values.append(record)
+    if values:
+        await session.execute(insert(MediaArchive), values)
+    return [value["id"] for value in values], local_paths
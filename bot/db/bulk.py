@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.dialect import id_in
+from bot.db.models import MediaContent, MediaTag, MediaVariant
+from bot.db.session import get_session
+from bot.similarity import forget_media
+from bot.tag_stats import tag_delta_for_media
+
+
+BULK_BATCH_SIZE = 500
+
+Progress = Callable[[int, int], Awaitable[None]]
+
+
+@dataclass
+class BulkResult:
+    matched: int = 0
+    changed: int = 0
+    local_paths: list[str] = field(default_factory=list)
+
+
+def _batches(ids: list[int], size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+async def target_ids(session: AsyncSession, ids: list[int] | None, criteria: list) -> list[int]:
+    if ids is None:
+        result = await session.execute(
+            select(MediaContent.id).where(*criteria).order_by(MediaContent.id)
+        )
+        return list(result.scalars())
+
+    found: list[int] = []
+    for batch in _batches(ids):
+        result = await session.execute(
+            select(MediaContent.id)
+            .where(id_in(session, MediaContent.id, batch), *criteria)
+            .order_by(MediaContent.id)
+        )
+        found.extend(result.scalars())
+    return found
+
+
+async def bulk_delete(ids: list[int], progress: Progress | None = None) -> BulkResult:
+    result = BulkResult(matched=len(ids))
+    async_session = get_session()
+    async with async_session() as session:
+        for batch in _batches(ids):
+            tag_delta = await tag_delta_for_media(session, batch, -1)
+            await tag_delta.write(session)
+            # Explicit so that dialects without enforced foreign keys do not keep links.
+            await session.execute(delete(MediaTag).where(id_in(session, MediaTag.media_id, batch)))
+            await session.execute(delete(MediaVariant).where(id_in(session, MediaVariant.media_id, batch)))
+            deleted = await session.execute(
+                delete(MediaContent)
+                .where(id_in(session, MediaContent.id, batch))
+                .returning(MediaContent.local_path)
+            )
+            paths = deleted.scalars().all()
+            await session.commit()
+            tag_delta.publish()
+            forget_media(batch)
+
+            result.changed += len(paths)
+            result.local_paths.extend(path for path in paths if path)
+            if progress is not None:
+                await progress(result.changed, result.matched)
+    return result
+
+
+async def bulk_approve(ids: list[int], progress: Progress | None = None) -> BulkResult:
+    result = BulkResult(matched=len(ids))
+    async_session = get_session()
+    async with async_session() as session:
+        for batch in _batches(ids):
+            tag_delta = await tag_delta_for_media(session, batch, 1, approved=False)
+            await tag_delta.write(session)
+            updated = await session.execute(
+                update(MediaContent)
+                .where(
+                    id_in(session, MediaContent.id, batch),
+                    MediaContent.is_approved.is_(False),
+                )
+                .values(is_approved=True)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            tag_delta.publish()
+
+            result.changed += updated.rowcount
+            if progress is not None:
+                await progress(result.changed, result.matched)
+    return result
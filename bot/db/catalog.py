@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.cache import browse_pages, media_counts, tag_ids
+from bot.db.models import MediaContent, MediaTag, Tag
+from bot.db.reads import NEWEST_FIRST, MediaRow, fetch_counted_page, fetch_page
+from bot.db.session import can_share_reads
+from bot.db.variants import Preview
+
+
+def visibility_criteria(only_approved: bool) -> list:
+    return [MediaContent.is_approved.is_(True)] if only_approved else []
+
+
+def filter_criteria(params, only_approved: bool) -> list:
+    criteria = visibility_criteria(only_approved)
+    if params.tags:
+        criteria.append(MediaContent.id.in_(tagged_media(params.tags)))
+    if params.start_dt:
+        criteria.append(MediaContent.created_at >= params.start_dt)
+    if params.end_dt:
+        criteria.append(MediaContent.created_at <= params.end_dt)
+    return criteria
+
+
+async def count_media(session: AsyncSession, only_approved: bool) -> int:
+    total = media_counts.get(only_approved)
+    if total is None:
+        query = select(func.count(MediaContent.id)).where(*visibility_criteria(only_approved))
+        total = await session.scalar(query) or 0
+        if can_share_reads(session):
+            media_counts.set(only_approved, total)
+    return total
+
+
+def page_count(total: int, page_size: int) -> int:
+    return max(1, (total + page_size - 1) // page_size)
+
+
+async def load_page(
+    session: AsyncSession,
+    criteria: list,
+    page: int,
+    page_size: int,
+    total: int | None = None,
+    order: tuple[tuple[str, bool], ...] = NEWEST_FIRST,
+    with_tags: bool = True,
+    preview: Preview | None = None,
+) -> tuple[list[MediaRow], int, int]:
+    if total is not None:
+        page = min(max(page, 1), page_count(total, page_size))
+        items = await fetch_page(
+            session,
+            criteria,
+            order=order,
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            with_tags=with_tags,
+            preview=preview,
+        )
+        return items, page, total
+
+    # Rows, total, tags and previews in one statement; only a page past the end needs a second one.
+    page = max(page, 1)
+    items, total = await fetch_counted_page(
+        session,
+        criteria,
+        order=order,
+        limit=page_size,
+        offset=(page - 1) * page_size,
+        with_tags=with_tags,
+        preview=preview,
+    )
+    if total is None:
+        total = await session.scalar(select(func.count(MediaContent.id)).where(*criteria)) or 0
+        return await load_page(session, criteria, page, page_size, total, order, with_tags, preview)
+    return items, page, total
+
+
+async def load_browse_page(
+    session: AsyncSession,
+    page: int,
+    page_size: int,
+    only_approved: bool,
+    order: tuple[tuple[str, bool], ...] = NEWEST_FIRST,
+    preview: Preview | None = None,
+) -> tuple[list[MediaRow], int, int]:
+    total = media_counts.get(only_approved)
+    if total is not None:
+        page = min(max(page, 1), page_count(total, page_size))
+        items = browse_pages.get((only_approved, page_size, page, order, preview))
+        if items is not None:
+            return items, page, page_count(total, page_size)
+
+    items, page, total = await load_page(
+        session,
+        visibility_criteria(only_approved),
+        page,
+        page_size,
+        total=total,
+        order=order,
+        preview=preview,
+    )
+    if can_share_reads(session):
+        media_counts.set(only_approved, total)
+        browse_pages.set((only_approved, page_size, page, order, preview), items)
+    return items, page, page_count(total, page_size)
+
+
+def tagged_media(names: list[str]) -> Select:
+    ids = [tag_ids.get(name) for name in names]
+    if None not in ids:
+        return select(MediaTag.media_id).where(MediaTag.tag_id.in_(ids))
+    # Unknown names are resolved inside the page statement instead of a lookup round trip.
+    return select(MediaTag.media_id).join(Tag, Tag.id == MediaTag.tag_id).where(Tag.name.in_(names))
+
+
+async def load_tag_ids(session: AsyncSession) -> int:
+    result = await session.execute(select(Tag.name, Tag.id))
+    count = 0
+    for name, tag_id in result:
+        tag_ids.set(name, tag_id)
+        count += 1
+    return count
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from sqlalchemy import Integer, any_, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_name(session: AsyncSession) -> str:
+    return session.bind.dialect.name
+
+
+def upsert_insert(session: AsyncSession):
+    # Both dialects expose the same on_conflict_* API on their insert().
+    return {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect_name(session))
+
+
+def id_in(session: AsyncSession, column, ids: list[int]):
+    if dialect_name(session) == "postgresql":
+        # One array parameter instead of one bind parameter per id.
+        return column == any_(literal(ids, postgresql.ARRAY(Integer)))
+    return column.in_(ids)
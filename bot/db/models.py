@@ -1,6 +1,16 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -10,15 +20,26 @@ class Base(DeclarativeBase):
 
 class MediaContent(Base):
     __tablename__ = "media_content"
+    __table_args__ = (
+        Index("ix_media_content_popularity", "view_count", "id"),
+        # Without AUTOINCREMENT SQLite hands out ids of deleted (archived) rows again.
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     telegram_file_id: Mapped[str] = mapped_column(String(255), nullable=False)
     telegram_file_unique_id: Mapped[str] = mapped_column(String(255), nullable=False)
     media_type: Mapped[str] = mapped_column(String(20), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     local_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
     is_approved: Mapped[bool] = mapped_column(default=True)
+    view_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    file_size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    checksum: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    duration: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     tags: Mapped[list["Tag"]] = relationship(
         "Tag",
@@ -56,3 +77,44 @@ class MediaTag(Base):
         nullable=False,
     )
 
+
+class MediaVariant(Base):
+    __tablename__ = "media_variants"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    media_id: Mapped[int] = mapped_column(
+        ForeignKey("media_content.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    telegram_file_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    telegram_file_unique_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    height: Mapped[int] = mapped_column(Integer, nullable=False)
+    file_size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+
+class TagStat(Base):
+    __tablename__ = "tag_stats"
+
+    tag_id: Mapped[int] = mapped_column(
+        ForeignKey("tags.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    media_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_used_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class MediaArchive(Base):
+    __tablename__ = "media_content_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    telegram_file_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    telegram_file_unique_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    media_type: Mapped[str] = mapped_column(String(20), nullable=False)
+    description: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    is_approved: Mapped[bool] = mapped_column(default=True)
+    tag_names: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
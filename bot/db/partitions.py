@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Integer,
+    MetaData,
+    Table,
+    UniqueConstraint,
+    column,
+    delete,
+    inspect,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.cache import invalidate_media
+from bot.config import get_settings
+from bot.db.archive import copy_to_archive
+from bot.db.dialect import id_in
+from bot.db.models import MediaContent, MediaTag, MediaVariant, Tag
+from bot.db.session import get_engine, get_session, get_session_factory, set_session_factory
+from bot.similarity import forget_media
+from bot.tag_stats import tag_delta_for_media
+
+
+logger = logging.getLogger(__name__)
+
+PARENT = MediaContent.__tablename__
+PARTITION_NAME = re.compile(rf"^{PARENT}_p(\d{{4}})_(\d{{2}})$")
+ARCHIVE_PREFIX = f"{PARENT}_archive_"
+
+
+def month_start(value: date | datetime, shift: int = 0) -> date:
+    index = value.year * 12 + value.month - 1 + shift
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month.year:04d}_{month.month:02d}"
+
+
+def _partitioned_media_table(metadata: MetaData) -> Table:
+    columns = []
+    for source in MediaContent.__table__.columns:
+        copy = source._copy()
+        if source.name == "created_at":
+            # The partition key has to be part of every unique constraint.
+            copy.primary_key = True
+            copy.nullable = False
+        columns.append(copy)
+    return Table(
+        PARENT,
+        metadata,
+        *columns,
+        postgresql_partition_by="RANGE (created_at)",
+    )
+
+
+def _media_tags_without_media_fk(metadata: MetaData) -> Table:
+    # Postgres cannot reference media_content(id) alone once the primary key
+    # includes created_at; deletes cascade through a trigger instead.
+    return Table(
+        MediaTag.__tablename__,
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("media_id", Integer, nullable=False, index=True),
+        Column("tag_id", Integer, ForeignKey(Tag.__table__.c.id, ondelete="CASCADE"), nullable=False),
+        UniqueConstraint("media_id", "tag_id", name="uq_media_tag"),
+    )
+
+
+def _media_variants_without_media_fk(metadata: MetaData) -> Table:
+    columns = [source._copy() for source in MediaVariant.__table__.columns]
+    for copy in columns:
+        if copy.name == "media_id":
+            copy.foreign_keys.clear()
+            copy.constraints.clear()
+    return Table(MediaVariant.__tablename__, metadata, *columns)
+
+
+def prepare_partitioned_schema(conn: Connection, months_ahead: int) -> None:
+    inspector = inspect(conn)
+    metadata = MetaData()
+    if not inspector.has_table(PARENT):
+        _partitioned_media_table(metadata).create(conn)
+        conn.execute(text(f"CREATE TABLE {PARENT}_default PARTITION OF {PARENT} DEFAULT"))
+        logger.info("Created partitioned %s", PARENT)
+    elif not is_partitioned(conn):
+        logger.warning("%s already exists and is not partitioned, skipping partitioning", PARENT)
+        return
+
+    Tag.__table__.create(conn, checkfirst=True)
+    if not inspector.has_table(MediaVariant.__tablename__):
+        _media_variants_without_media_fk(metadata).create(conn)
+    conn.execute(
+        text(
+            f"""
+            CREATE OR REPLACE FUNCTION {PARENT}_delete_tags() RETURNS trigger AS $$
+            BEGIN
+                DELETE FROM {MediaTag.__tablename__} WHERE media_id = OLD.id;
+                DELETE FROM {MediaVariant.__tablename__} WHERE media_id = OLD.id;
+                RETURN OLD;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+    )
+    if not inspector.has_table(MediaTag.__tablename__):
+        _media_tags_without_media_fk(metadata).create(conn)
+        conn.execute(
+            text(
+                f"CREATE TRIGGER {PARENT}_delete_tags AFTER DELETE ON {PARENT} "
+                f"FOR EACH ROW EXECUTE FUNCTION {PARENT}_delete_tags()"
+            )
+        )
+
+    for statement in _ensure_partition_statements(datetime.utcnow(), months_ahead):
+        conn.execute(text(statement))
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return bool(
+        conn.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"),
+            {"name": PARENT},
+        ).scalar()
+    )
+
+
+def _ensure_partition_statements(now: datetime, months_ahead: int) -> list[str]:
+    statements = []
+    for shift in range(0, months_ahead + 1):
+        start = month_start(now, shift)
+        end = month_start(now, shift + 1)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {PARENT} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return statements
+
+
+async def list_partitions() -> list[str]:
+    async_session = get_session()
+    async with async_session() as session:
+        result = await session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :parent ORDER BY child.relname"
+            ),
+            {"parent": PARENT},
+        )
+        return list(result.scalars())
+
+
+async def ensure_partitions(months_ahead: int | None = None) -> int:
+    if months_ahead is None:
+        months_ahead = get_settings().partition_months_ahead
+    before = set(await list_partitions())
+    async_session = get_session()
+    async with async_session() as session:
+        for statement in _ensure_partition_statements(datetime.utcnow(), months_ahead):
+            await session.execute(text(statement))
+        await session.commit()
+    created = len(set(await list_partitions()) - before)
+    if created:
+        logger.info("Created %s future partitions of %s", created, PARENT)
+    return created
+
+
+async def archive_partition_rows(session: AsyncSession, name: str, batch_size: int) -> int:
+    # DETACH does not fire the delete trigger, so the rows are copied into
+    # media_content_archive (with their tag names, for /get) and their links,
+    # variants and tag counts dropped first. Reruns skip what is already archived.
+    # Local files are left to bot.storage.gc once the rows leave media_content.
+    partition = table(name, column("id"))
+    archived = 0
+    last_id = 0
+    while True:
+        ids = list(
+            (
+                await session.execute(
+                    select(partition.c.id)
+                    .where(partition.c.id > last_id)
+                    .order_by(partition.c.id)
+                    .limit(batch_size)
+                )
+            ).scalars()
+        )
+        if not ids:
+            return archived
+        last_id = ids[-1]
+        copied, _ = await copy_to_archive(session, ids)
+        tag_delta = await tag_delta_for_media(session, ids, -1)
+        await tag_delta.write(session)
+        await session.execute(delete(MediaTag).where(id_in(session, MediaTag.media_id, ids)))
+        await session.execute(delete(MediaVariant).where(id_in(session, MediaVariant.media_id, ids)))
+        await session.commit()
+        tag_delta.publish()
+        forget_media(ids)
+        archived += len(copied)
+
+
+async def archive_partitions(keep_months: int) -> list[str]:
+    cutoff = month_start(datetime.utcnow(), -keep_months)
+    batch_size = get_settings().maintenance_batch_size
+    archived = []
+    async_session = get_session()
+    async with async_session() as session:
+        for name in await list_partitions():
+            match = PARTITION_NAME.match(name)
+            if not match:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if month_start(month, 1) > cutoff:
+                continue
+            archive_name = f"{ARCHIVE_PREFIX}{match.group(1)}_{match.group(2)}"
+            copied = await archive_partition_rows(session, name, batch_size)
+            await session.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+            await session.execute(text(f"ALTER TABLE {name} RENAME TO {archive_name}"))
+            await session.commit()
+            archived.append(archive_name)
+            logger.info("Detached %s as %s, %s rows archived", name, archive_name, copied)
+    if archived:
+        invalidate_media()
+    return archived
+
+
+async def maintain_partitions() -> None:
+    settings = get_settings()
+    async_session = get_session()
+    async with async_session() as session:
+        conn = await session.connection()
+        if not await conn.run_sync(is_partitioned):
+            return
+    await ensure_partitions(settings.partition_months_ahead)
+    if settings.partition_archive_after_months > 0:
+        await archive_partitions(settings.partition_archive_after_months)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of media_content.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ensure = subparsers.add_parser("ensure", help="create partitions for upcoming months")
+    ensure.add_argument("--months-ahead", type=int)
+    archive = subparsers.add_parser("archive", help="detach partitions older than N months")
+    archive.add_argument("--keep-months", type=int, required=True)
+    subparsers.add_parser("list", help="show attached partitions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine()
+    set_session_factory(get_session_factory(engine))
+    try:
+        if args.command == "ensure":
+            await ensure_partitions(args.months_ahead)
+        elif args.command == "archive":
+            await archive_partitions(args.keep_months)
+        else:
+            for name in await list_partitions():
+                print(name)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
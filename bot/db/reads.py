@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Sequence
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.models import MediaArchive, MediaContent, MediaTag, Tag
+from bot.db.variants import Preview, preview_column
+
+
+@dataclass(slots=True, frozen=True)
+class MediaRow:
+    id: int
+    telegram_file_id: str
+    media_type: str
+    description: str
+    created_at: datetime
+    local_path: str | None
+    is_approved: bool
+    tags: tuple[str, ...] = ()
+    # File id of the variant picked by page_query(preview=...), sent instead of the original.
+    preview: str | None = None
+
+
+ROW_COLUMNS = (
+    MediaContent.id,
+    MediaContent.telegram_file_id,
+    MediaContent.media_type,
+    MediaContent.description,
+    MediaContent.created_at,
+    MediaContent.local_path,
+    MediaContent.is_approved,
+)
+# (column name, descending) pairs, applied both inside and outside the page subquery.
+NEWEST_FIRST = (("created_at", True), ("id", True))
+POPULAR_FIRST = (("view_count", True), ("id", True))
+
+
+def tags_aggregate(dialect: str):
+    if dialect == "postgresql":
+        return func.array_agg(aggregate_order_by(Tag.name, Tag.name)).filter(Tag.name.is_not(None))
+    # Tag names are restricted to [A-Za-z0-9_], so a space is a safe separator.
+    return func.group_concat(Tag.name, " ")
+
+
+def split_tags(value: Any) -> tuple[str, ...]:
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return tuple(sorted(value.split(" ")))
+    return tuple(value)
+
+
+def page_query(
+    dialect: str,
+    criteria: Sequence[Any] = (),
+    order: Sequence[tuple[str, bool]] = NEWEST_FIRST,
+    limit: int | None = None,
+    offset: int = 0,
+    with_tags: bool = True,
+    with_total: bool = False,
+    preview: Preview | None = None,
+) -> Select:
+    columns = list(ROW_COLUMNS)
+    names = {column.key for column in columns}
+    columns.extend(getattr(MediaContent, name) for name, _ in order if name not in names)
+    if with_total:
+        # Window functions run before LIMIT, so every row carries the size of the whole match.
+        columns.append(func.count().over().label("total"))
+
+    base = select(*columns).where(*criteria).order_by(*_ordering(MediaContent, order))
+    if limit is not None:
+        base = base.limit(limit)
+    if offset:
+        base = base.offset(offset)
+    if not with_tags and preview is None:
+        return base
+
+    # Tags and previews are looked up for the page rows only, after LIMIT.
+    page = base.subquery("page")
+    columns = list(page.c)
+    if preview is not None:
+        columns.append(preview_column(page.c.id, preview).label("preview"))
+    if with_tags:
+        columns.append(tags_aggregate(dialect).label("tags"))
+    query = select(*columns).select_from(page)
+    if with_tags:
+        query = (
+            query.outerjoin(MediaTag, MediaTag.media_id == page.c.id)
+            .outerjoin(Tag, Tag.id == MediaTag.tag_id)
+            .group_by(*page.c)
+        )
+    return query.order_by(*_ordering(page.c, order))
+
+
+def _ordering(source: Any, order: Sequence[tuple[str, bool]]) -> list[Any]:
+    clauses = []
+    for name, descending in order:
+        column = getattr(source, name)
+        clauses.append(column.desc() if descending else column.asc())
+    return clauses
+
+
+def to_row(row: Any) -> MediaRow:
+    mapping = row._mapping
+    return MediaRow(
+        id=mapping["id"],
+        telegram_file_id=mapping["telegram_file_id"],
+        media_type=mapping["media_type"],
+        description=mapping["description"],
+        created_at=mapping["created_at"],
+        local_path=mapping["local_path"],
+        is_approved=mapping["is_approved"],
+        tags=split_tags(mapping.get("tags")),
+        preview=mapping.get("preview"),
+    )
+
+
+async def fetch_rows(session: AsyncSession, query: Select) -> list[MediaRow]:
+    result = await session.execute(query)
+    return [to_row(row) for row in result]
+
+
+async def fetch_page(
+    session: AsyncSession,
+    criteria: Sequence[Any] = (),
+    order: Sequence[tuple[str, bool]] = NEWEST_FIRST,
+    limit: int | None = None,
+    offset: int = 0,
+    with_tags: bool = True,
+    preview: Preview | None = None,
+) -> list[MediaRow]:
+    query = page_query(
+        session.bind.dialect.name,
+        criteria,
+        order=order,
+        limit=limit,
+        offset=offset,
+        with_tags=with_tags,
+        preview=preview,
+    )
+    return await fetch_rows(session, query)
+
+
+async def fetch_counted_page(
+    session: AsyncSession,
+    criteria: Sequence[Any] = (),
+    order: Sequence[tuple[str, bool]] = NEWEST_FIRST,
+    limit: int | None = None,
+    offset: int = 0,
+    with_tags: bool = True,
+    preview: Preview | None = None,
+) -> tuple[list[MediaRow], int | None]:
+    query = page_query(
+        session.bind.dialect.name,
+        criteria,
+        order=order,
+        limit=limit,
+        offset=offset,
+        with_tags=with_tags,
+        with_total=True,
+        preview=preview,
+    )
+    result = (await session.execute(query)).all()
+    # An empty page says nothing about the total when it starts past the end.
+    total = result[0].total if result else (0 if offset == 0 else None)
+    return [to_row(row) for row in result], total
+
+
+async def fetch_media(session: AsyncSession, media_id: int) -> MediaRow | None:
+    rows = await fetch_page(session, [MediaContent.id == media_id], limit=1)
+    return rows[0] if rows else None
+
+
+async def fetch_archived(session: AsyncSession, media_id: int) -> MediaRow | None:
+    archived = await session.get(MediaArchive, media_id)
+    if archived is None:
+        return None
+    return MediaRow(
+        id=archived.id,
+        telegram_file_id=archived.telegram_file_id,
+        media_type=archived.media_type,
+        description=archived.description,
+        created_at=archived.created_at,
+        local_path=None,
+        is_approved=archived.is_approved,
+        tags=split_tags(archived.tag_names),
+    )
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from bot.config import get_settings
+from bot.db.models import Base
+from bot.db.partitions import prepare_partitioned_schema
+
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_schema(conn: Connection) -> None:
+    settings = get_settings()
+    if settings.partitioning_enabled:
+        if conn.dialect.name == "postgresql":
+            prepare_partitioned_schema(conn, settings.partition_months_ahead)
+        else:
+            logger.warning("Partitioning requires PostgreSQL, using a plain media_content table")
+
+    Base.metadata.create_all(conn)
+    ensure_columns(conn)
+    ensure_indexes(conn)
+
+
+def schema_is_current(conn: Connection) -> bool:
+    # Cheap enough to run before polling: ORM queries select every mapped column,
+    # so only a schema that already has all of them may be upgraded in the background.
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            return False
+        if _missing_columns(inspector, table) or _missing_indexes(inspector, table):
+            return False
+    return True
+
+
+def _missing_columns(inspector, table) -> list:
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    return [column for column in table.columns if column.name not in existing]
+
+
+def _missing_indexes(inspector, table) -> list:
+    existing = {index["name"] for index in inspector.get_indexes(table.name)}
+    return [index for index in table.indexes if index.name not in existing]
+
+
+def ensure_columns(conn: Connection) -> None:
+    # Same story as ensure_indexes: new nullable or server-defaulted columns
+    # are added to tables that already exist.
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        for column in _missing_columns(inspector, table):
+            ddl = (
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(conn.dialect)}"
+            )
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            logger.info("Adding column %s.%s", table.name, column.name)
+            conn.execute(text(ddl))
+
+
+def ensure_indexes(conn: Connection) -> None:
+    # create_all skips existing tables, so indexes added to the models later
+    # would never reach an existing database without this pass.
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in _missing_indexes(inspector, table):
+            index.create(conn)
@@ -1,3 +1,5 @@
+import time
+
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -5,6 +7,11 @@ from bot.config import get_settings
 
 
 _session_factory: sessionmaker | None = None
+_read_session_factory: sessionmaker | None = None
+_recent_writes: dict[int, float] = {}
+_last_write = 0.0
+
+MAX_TRACKED_WRITERS = 10_000
 
 
 def get_engine() -> AsyncEngine:
@@ -12,6 +19,13 @@ def get_engine() -> AsyncEngine:
     return create_async_engine(settings.database_url, echo=False)
 
 
+def get_read_engine() -> AsyncEngine | None:
+    settings = get_settings()
+    if not settings.database_read_url:
+        return None
+    return create_async_engine(settings.database_read_url, echo=False)
+
+
 def get_session_factory(engine: AsyncEngine) -> sessionmaker:
     return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -21,8 +35,46 @@ def set_session_factory(factory: sessionmaker) -> None:
     _session_factory = factory
 
 
+def set_read_session_factory(factory: sessionmaker | None) -> None:
+    global _read_session_factory
+    _read_session_factory = factory
+
+
 def get_session() -> sessionmaker:
     if _session_factory is None:
         raise RuntimeError("Session factory is not initialized")
     return _session_factory
 
+
+def get_read_session(user_id: int | None = None) -> sessionmaker:
+    if _read_session_factory is None:
+        return get_session()
+    if user_id is not None:
+        written_at = _recent_writes.get(user_id)
+        if written_at is not None:
+            if time.monotonic() - written_at < get_settings().read_your_writes_seconds:
+                return get_session()
+            _recent_writes.pop(user_id, None)
+    return _read_session_factory
+
+
+def mark_write(user_id: int | None) -> None:
+    global _last_write
+    if user_id is None or _read_session_factory is None:
+        return
+    now = time.monotonic()
+    _last_write = now
+    _recent_writes[user_id] = now
+    if len(_recent_writes) > MAX_TRACKED_WRITERS:
+        window = get_settings().read_your_writes_seconds
+        for key, written_at in list(_recent_writes.items()):
+            if now - written_at >= window:
+                del _recent_writes[key]
+
+
+def can_share_reads(session: AsyncSession) -> bool:
+    # While any writer is inside its window the replica may still miss that write:
+    # rows read there must not land in caches the writer is served from.
+    if _read_session_factory is None or session.bind is not _read_session_factory.kw["bind"]:
+        return True
+    return time.monotonic() - _last_write >= get_settings().read_your_writes_seconds
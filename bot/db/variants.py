@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import case, select
+
+from bot.db.models import MediaVariant
+
+
+PHOTO = "photo"
+THUMBNAIL = "thumbnail"
+
+
+def variant_values(kind: str, size: Any) -> dict:
+    # size is an aiogram PhotoSize: photo sizes and video thumbnails share the type.
+    return {
+        "kind": kind,
+        "telegram_file_id": size.file_id,
+        "telegram_file_unique_id": size.file_unique_id,
+        "width": size.width,
+        "height": size.height,
+        "file_size": size.file_size,
+    }
+
+
+@dataclass(frozen=True)
+class Preview:
+    min_side: int
+    kinds: tuple[str, ...] = (PHOTO,)
+
+
+def preview_column(media_id: Any, preview: Preview):
+    side = case((MediaVariant.width > MediaVariant.height, MediaVariant.width), else_=MediaVariant.height)
+    covers = side >= preview.min_side
+    return (
+        select(MediaVariant.telegram_file_id)
+        .where(MediaVariant.media_id == media_id, MediaVariant.kind.in_(preview.kinds))
+        # The smallest variant covering min_side, otherwise the largest one there is.
+        .order_by(case((covers, 0), else_=1), case((covers, side), else_=-side))
+        .limit(1)
+        .scalar_subquery()
+    )
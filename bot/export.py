@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+from sqlalchemy import select
+
+from bot.db.models import MediaArchive, MediaContent, MediaTag, MediaVariant, Tag
+from bot.db.session import get_engine, get_session, get_session_factory, set_session_factory
+
+
+logger = logging.getLogger(__name__)
+
+FIELDS = [
+    "id",
+    "telegram_file_id",
+    "telegram_file_unique_id",
+    "media_type",
+    "description",
+    "created_at",
+    "local_path",
+    "is_approved",
+    "view_count",
+    "file_size",
+    "checksum",
+    "width",
+    "height",
+    "duration",
+    "tags",
+    "variants",
+    "archived",
+    "archived_at",
+]
+MEDIA_COLUMNS = [
+    getattr(MediaContent, name) for name in FIELDS if name not in ("tags", "variants", "archived", "archived_at")
+]
+# Archived rows carry a subset of the fields and "archived": true.
+ARCHIVE_COLUMNS = [
+    MediaArchive.id,
+    MediaArchive.telegram_file_id,
+    MediaArchive.telegram_file_unique_id,
+    MediaArchive.media_type,
+    MediaArchive.description,
+    MediaArchive.created_at,
+    MediaArchive.is_approved,
+    MediaArchive.tag_names,
+    MediaArchive.archived_at,
+]
+VARIANT_FIELDS = ["kind", "telegram_file_id", "telegram_file_unique_id", "width", "height", "file_size"]
+VARIANT_COLUMNS = [getattr(MediaVariant, name) for name in VARIANT_FIELDS]
+
+
+class RateReporter:
+    def __init__(self, label: str, every: int = 10_000) -> None:
+        self.label = label
+        self.every = every
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._next = every
+
+    def add(self, count: int) -> None:
+        self.rows += count
+        if self.rows >= self._next:
+            self._next += self.every
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        logger.info(
+            "%s%s %s rows in %.1fs (%.0f rows/s)",
+            self.label,
+            " finished:" if final else ":",
+            self.rows,
+            elapsed,
+            self.rows / elapsed,
+        )
+
+
+async def export_catalog(out: IO[str], fmt: str, batch_size: int = 1000) -> int:
+    writer = _make_writer(out, fmt)
+    reporter = RateReporter("Export")
+    async_session = get_session()
+    async with async_session() as session, async_session() as link_session:
+        result = await session.stream(
+            select(*MEDIA_COLUMNS)
+            .order_by(MediaContent.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            ids = [row.id for row in partition]
+            tag_rows = await link_session.execute(
+                select(MediaTag.media_id, Tag.name)
+                .join(Tag, Tag.id == MediaTag.tag_id)
+                .where(MediaTag.media_id.in_(ids))
+                .order_by(MediaTag.media_id, Tag.name)
+            )
+            tags: dict[int, list[str]] = {}
+            for media_id, name in tag_rows:
+                tags.setdefault(media_id, []).append(name)
+            variant_rows = await link_session.execute(
+                select(MediaVariant.media_id, *VARIANT_COLUMNS)
+                .where(MediaVariant.media_id.in_(ids))
+                .order_by(MediaVariant.media_id, MediaVariant.id)
+            )
+            variants: dict[int, list[dict]] = {}
+            for variant in variant_rows:
+                values = variant._asdict()
+                variants.setdefault(values.pop("media_id"), []).append(values)
+            for row in partition:
+                record = row._asdict()
+                record["created_at"] = row.created_at.isoformat() if row.created_at else None
+                record["tags"] = tags.get(row.id, [])
+                record["variants"] = variants.get(row.id, [])
+                record["archived"] = False
+                record["archived_at"] = None
+                writer(record)
+            reporter.add(len(partition))
+
+        result = await session.stream(
+            select(*ARCHIVE_COLUMNS)
+            .order_by(MediaArchive.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            for row in partition:
+                record = row._asdict()
+                record["created_at"] = row.created_at.isoformat()
+                record["tags"] = record.pop("tag_names").split()
+                record["archived"] = True
+                record["archived_at"] = row.archived_at.isoformat() if row.archived_at else None
+                writer(record)
+            reporter.add(len(partition))
+    reporter.report(final=True)
+    return reporter.rows
+
+
+def _make_writer(out: IO[str], fmt: str):
+    if fmt == "jsonl":
+        def write_jsonl(record: dict) -> None:
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write("\n")
+
+        return write_jsonl
+
+    csv_writer = csv.DictWriter(out, fieldnames=FIELDS)
+    csv_writer.writeheader()
+
+    def write_csv(record: dict) -> None:
+        record["tags"] = " ".join(record["tags"])
+        if "variants" in record:
+            record["variants"] = json.dumps(record["variants"], ensure_ascii=False)
+        csv_writer.writerow(record)
+
+    return write_csv
+
+
+def detect_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    return "csv" if Path(path).suffix.lower() == ".csv" else "jsonl"
+
+
+@contextmanager
+def _open_output(path: str) -> Iterator[IO[str]]:
+    if path == "-":
+        yield sys.stdout
+        return
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        yield handle
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream the media catalog to JSONL or CSV.")
+    parser.add_argument("output", help="target file, '-' for stdout")
+    parser.add_argument("--format", choices=("jsonl", "csv"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    engine = get_engine()
+    set_session_factory(get_session_factory(engine))
+    try:
+        with _open_output(args.output) as out:
+            await export_catalog(out, detect_format(args.output, args.format), args.batch_size)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
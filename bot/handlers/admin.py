@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import time
+
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from bot.cache import invalidate_media
+from bot.config import get_settings
+from bot.db.bulk import bulk_approve, bulk_delete, target_ids
+from bot.db.catalog import filter_criteria
+from bot.db.models import MediaContent
+from bot.db.session import get_session, mark_write
+from bot.handlers.helpers import sender_is_admin
+from bot.storage.store import get_media_store
+from bot.utils.metrics import metrics
+from bot.utils.parsing import MAX_ID_SPEC, parse_filter_args, parse_id_spec
+
+
+router = Router()
+
+PROGRESS_INTERVAL = 1.0
+
+
+@router.message(Command("metrics"))
+async def show_metrics(message: Message) -> None:
+    if not sender_is_admin(message, get_settings()):
+        await message.answer("Команда доступна только администраторам.")
+        return
+    snapshot = metrics.snapshot()
+    if not snapshot:
+        await message.answer("Метрик пока нет.")
+        return
+    lines = [f"{name}: {value}" for name, value in snapshot.items()]
+    await message.answer("<b>Метрики</b>:\n" + "\n".join(lines))
+
+
+@router.message(Command("bulk_delete"))
+async def bulk_delete_media(message: Message) -> None:
+    await _run_bulk(message, "delete")
+
+
+@router.message(Command("bulk_approve"))
+async def bulk_approve_media(message: Message) -> None:
+    await _run_bulk(message, "approve")
+
+
+async def _run_bulk(message: Message, action: str) -> None:
+    settings = get_settings()
+    if not sender_is_admin(message, settings):
+        await message.answer("Команда доступна только администраторам.")
+        return
+
+    args = message.text.split(maxsplit=1)
+    words = args[1].split() if len(args) > 1 else []
+    dry_run = "dry" in words
+    raw = " ".join(word for word in words if word != "dry")
+    if not raw:
+        await message.answer(
+            f"Использование: /bulk_{action} &lt;ids|диапазон|фильтр&gt; [dry]\n"
+            f"Пример: /bulk_{action} 10,12,20-40\n"
+            f"Пример: /bulk_{action} #spam days=1 dry"
+        )
+        return
+
+    try:
+        ids = parse_id_spec(raw)
+    except ValueError:
+        await message.answer(f"Слишком много ID, максимум {MAX_ID_SPEC}.")
+        return
+
+    params = None
+    if ids is None:
+        params = parse_filter_args(raw)
+        if not (params.tags or params.start_dt or params.end_dt):
+            await message.answer("Нужно указать ID, диапазон, теги или даты.")
+            return
+
+    async_session = get_session()
+    async with async_session() as session:
+        criteria = filter_criteria(params, False) if params else []
+        if action == "approve":
+            criteria.append(MediaContent.is_approved.is_(False))
+        targets = await target_ids(session, ids, criteria)
+
+    verb = "удалено" if action == "delete" else "одобрено"
+    if dry_run or not targets:
+        await message.answer(f"Подходит записей: {len(targets)}. Ничего не изменено.")
+        return
+
+    status = await message.answer(f"Обработка: 0/{len(targets)}")
+    last_update = time.monotonic()
+
+    async def progress(done: int, total: int) -> None:
+        nonlocal last_update
+        if done < total and time.monotonic() - last_update < PROGRESS_INTERVAL:
+            return
+        last_update = time.monotonic()
+        try:
+            await status.edit_text(f"Обработка: {done}/{total}")
+        except TelegramBadRequest:
+            pass
+
+    if action == "delete":
+        result = await bulk_delete(targets, progress)
+        get_media_store().schedule_release(result.local_paths)
+    else:
+        result = await bulk_approve(targets, progress)
+
+    mark_write(message.from_user.id if message.from_user else None)
+    invalidate_media()
+    metrics.inc(f"bulk.{action}", result.changed)
+    await status.edit_text(f"Готово: {verb} {result.changed} из {result.matched}.")
@@ -6,9 +6,11 @@ from aiogram.types import KeyboardButton, Message, ReplyKeyboardMarkup
 from bot.handlers.query import browse_media, send_ids_page
 from bot.handlers.upload import upload_cancel, upload_start
 from bot.states.actions import ActionStates
+from bot.utils.dispatch import Route, TextRoutes
 
 
 router = Router()
+menu = TextRoutes()
 
 MAIN_KEYBOARD = ReplyKeyboardMarkup(
     keyboard=[
@@ -39,15 +41,20 @@ async def help_handler(message: Message) -> None:
     await message.answer(
         "<b>Короткая шпаргалка</b> 📌\n"
         "📤 /upload — отправьте фото или видео, затем описание\n"
+        "⚡ Или сразу отправьте фото/видео с подписью — она станет описанием\n"
         "🖼️ /list — листать записи с фото/видео\n"
+        "🔥 /top — листать самые просматриваемые записи\n"
+        "🖼️ /gallery [page] — альбомы по 10 записей\n"
         "🔎 /ids [page] — список ID\n"
         "🧾 /get &lt;id&gt; — медиа и описание\n"
         "🏷️ /filter #tag days=7 page=2\n"
         "🏷️ /filter #tag from=2025-01-01 to=2025-01-19 page=2\n"
         "🔤 /search &lt;слово&gt; — поиск по описанию\n"
+        "🏷️ /tags [начало] — популярные теги\n"
         "✏️ /edit &lt;id&gt; &lt;новое описание&gt;\n"
         "🗑️ /delete &lt;id&gt; — удалить запись\n"
         "✅ /approve &lt;id&gt; — одобрить (для админов)\n"
+        "🧹 /bulk_delete, /bulk_approve 1,5,10-20 или #tag days=1 [dry] — массово (для админов)\n"
         "❌ /cancel — отменить загрузку",
         reply_markup=MAIN_KEYBOARD,
     )
@@ -61,28 +68,33 @@ async def menu_handler(message: Message) -> None:
     )
 
 
-@router.message(lambda m: m.text == "📤 Загрузить")
+@router.message(menu.filter)
+async def menu_dispatch(message: Message, state: FSMContext, route: Route) -> None:
+    await route(message, state)
+
+
+@menu("📤 Загрузить")
 async def menu_upload(message: Message, state: FSMContext) -> None:
     await upload_start(message, state)
 
 
-@router.message(lambda m: m.text == "🖼️ Лента")
-async def menu_browse(message: Message) -> None:
+@menu("🖼️ Лента")
+async def menu_browse(message: Message, state: FSMContext) -> None:
     await browse_media(message)
 
 
-@router.message(lambda m: m.text == "🔎 Список ID")
-async def menu_ids(message: Message) -> None:
+@menu("🔎 Список ID")
+async def menu_ids(message: Message, state: FSMContext) -> None:
     await send_ids_page(message, page=1)
 
 
-@router.message(lambda m: m.text == "🧾 Найти по ID")
+@menu("🧾 Найти по ID")
 async def menu_get_hint(message: Message, state: FSMContext) -> None:
     await state.set_state(ActionStates.waiting_get_id)
     await message.answer("Введите ID записи (например: 12).")
 
 
-@router.message(lambda m: m.text == "🏷️ Фильтр")
+@menu("🏷️ Фильтр")
 async def menu_filter_hint(message: Message, state: FSMContext) -> None:
     await state.set_state(ActionStates.waiting_filter_args)
     await message.answer(
@@ -92,35 +104,34 @@ async def menu_filter_hint(message: Message, state: FSMContext) -> None:
     )
 
 
-@router.message(lambda m: m.text == "🔤 Поиск")
+@menu("🔤 Поиск")
 async def menu_search_hint(message: Message, state: FSMContext) -> None:
     await state.set_state(ActionStates.waiting_search_text)
     await message.answer("Введите слово или фразу для поиска.")
 
 
-@router.message(lambda m: m.text == "✏️ Редактировать")
+@menu("✏️ Редактировать")
 async def menu_edit_hint(message: Message, state: FSMContext) -> None:
     await state.set_state(ActionStates.waiting_edit_id)
     await message.answer("Введите ID записи для редактирования.")
 
 
-@router.message(lambda m: m.text == "🗑️ Удалить")
+@menu("🗑️ Удалить")
 async def menu_delete_hint(message: Message, state: FSMContext) -> None:
     await state.set_state(ActionStates.waiting_delete_id)
     await message.answer("Введите ID записи для удаления.")
 
 
-@router.message(lambda m: m.text == "📚 Помощь")
-async def menu_help(message: Message) -> None:
+@menu("📚 Помощь")
+async def menu_help(message: Message, state: FSMContext) -> None:
     await help_handler(message)
 
 
-@router.message(lambda m: m.text == "❌ Отменить")
+@menu("❌ Отменить")
 async def menu_cancel(message: Message, state: FSMContext) -> None:
     await upload_cancel(message, state)
 
 
-@router.message(lambda m: m.text == "🏠 Меню")
-async def menu_show(message: Message) -> None:
+@menu("🏠 Меню")
+async def menu_show(message: Message, state: FSMContext) -> None:
     await menu_handler(message)
-
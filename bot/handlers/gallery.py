@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import html
+import logging
+import weakref
+from collections import OrderedDict
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import (
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
+from bot.config import get_settings
+from bot.db.catalog import load_browse_page
+from bot.db.reads import MediaRow
+from bot.db.session import get_read_session
+from bot.db.variants import PHOTO, THUMBNAIL, Preview
+from bot.handlers.helpers import build_input_media, sender_id, sender_is_admin
+from bot.handlers.query import callbacks
+from bot.utils.coalesce import LatestOnly
+from bot.views import view_counter
+
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+GALLERY_PAGE_SIZE = 10
+# Album tiles are small: photos use their smallest size covering this, videos their thumbnail.
+GALLERY_PREVIEW = Preview(min_side=320, kinds=(PHOTO, THUMBNAIL))
+MAX_TRACKED_GALLERIES = 2000
+GALLERY_DEBOUNCE = 0.3
+
+# (chat_id, navigation message id) -> ids of the album messages below it.
+# Kept in memory only: after a restart the first page turn leaves the old album in the chat.
+_galleries: OrderedDict[tuple[int, int], list[int]] = OrderedDict()
+_gallery_turns = LatestOnly("gallery", delay=GALLERY_DEBOUNCE)
+_turn_locks: weakref.WeakValueDictionary[tuple[int, int], asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+@router.message(Command("gallery"))
+async def gallery_media(message: Message) -> None:
+    args = message.text.split(maxsplit=1)
+    page = int(args[1]) if len(args) > 1 and args[1].isdigit() else 1
+    await _send_gallery_page(message, message, page=page)
+
+
+@callbacks("gallery")
+async def gallery_callback(callback: CallbackQuery, payload: str) -> None:
+    if not payload.isdigit() or callback.message is None:
+        await callback.answer()
+        return
+    nav = callback.message
+    await _gallery_turns.run(
+        (nav.chat.id, nav.message_id),
+        lambda: _send_gallery_page(callback, nav, page=int(payload), nav=nav),
+    )
+    await callback.answer()
+
+
+async def _send_gallery_page(
+    event: Message | CallbackQuery,
+    message: Message,
+    page: int,
+    nav: Message | None = None,
+) -> None:
+    settings = get_settings()
+    is_admin = sender_is_admin(event, settings)
+
+    async_session = get_read_session(sender_id(event))
+    async with async_session() as session:
+        items, page, pages = await load_browse_page(
+            session,
+            page,
+            GALLERY_PAGE_SIZE,
+            only_approved=not is_admin and settings.moderation_enabled,
+            preview=GALLERY_PREVIEW,
+        )
+
+    if not items:
+        if nav is not None:
+            await asyncio.shield(_turn_page(message, nav, [], "Список пуст.", None))
+        else:
+            await message.answer("Список пуст.")
+        return
+
+    for item in items:
+        view_counter.record(item.id)
+    text = _gallery_text(items, page, pages)
+    keyboard = _gallery_keyboard(page, pages)
+    if nav is None:
+        nav = await message.answer(text, reply_markup=keyboard)
+        album = await _send_album(message, items)
+        _remember(nav.chat.id, nav.message_id, [m.message_id for m in album])
+    else:
+        # A superseded turn is cancelled while loading; once it starts swapping albums
+        # it runs to the end, so the album it sent is always remembered and dropped next.
+        await asyncio.shield(_turn_page(message, nav, items, text, keyboard))
+
+
+async def _turn_page(
+    message: Message,
+    nav: Message,
+    items: list[MediaRow],
+    text: str,
+    keyboard: InlineKeyboardMarkup | None,
+) -> None:
+    # A page turn costs three calls: drop the old album, send the new one, edit the navigation.
+    key = (nav.chat.id, nav.message_id)
+    lock = _turn_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        await _drop_album(message.bot, nav.chat.id, nav.message_id)
+        if items:
+            album = await _send_album(message, items)
+            _remember(nav.chat.id, nav.message_id, [m.message_id for m in album])
+        await nav.edit_text(text, reply_markup=keyboard)
+
+
+async def _send_album(
+    message: Message,
+    items: list[MediaRow],
+) -> list[Message]:
+    media = [build_input_media(item, _album_caption(item)) for item in items]
+    if len(media) == 1:
+        if media[0].type == "photo":
+            sent = await message.answer_photo(media[0].media, caption=media[0].caption)
+        else:
+            sent = await message.answer_video(media[0].media, caption=media[0].caption)
+        return [sent]
+    return await message.answer_media_group(media)
+
+
+async def _drop_album(bot, chat_id: int, nav_message_id: int) -> None:
+    album_ids = _galleries.pop((chat_id, nav_message_id), [])
+    if not album_ids:
+        return
+    try:
+        await bot.delete_messages(chat_id, album_ids)
+    except Exception:
+        logger.debug("Could not delete previous gallery album", exc_info=True)
+
+
+def _remember(chat_id: int, nav_message_id: int, album_ids: list[int]) -> None:
+    _galleries[(chat_id, nav_message_id)] = album_ids
+    while len(_galleries) > MAX_TRACKED_GALLERIES:
+        _galleries.popitem(last=False)
+
+
+def _album_caption(media: MediaRow) -> str:
+    preview = html.escape(media.description.strip().replace("\n", " "))
+    if len(preview) > 60:
+        preview = preview[:57] + "..."
+    return f"<b>#{media.id}</b> {preview}"
+
+
+def _gallery_text(items: list[MediaRow], page: int, pages: int) -> str:
+    ids = ", ".join(str(item.id) for item in items)
+    return f"🖼️ <b>Галерея</b>: стр. {page}/{pages}\nID: {ids}"
+
+
+def _gallery_keyboard(page: int, pages: int) -> InlineKeyboardMarkup:
+    buttons = []
+    if page > 1:
+        buttons.append(InlineKeyboardButton(text="⬅️ Предыдущая", callback_data=f"gallery:{page - 1}"))
+    if page < pages:
+        buttons.append(InlineKeyboardButton(text="Следующая ➡️", callback_data=f"gallery:{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
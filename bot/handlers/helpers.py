@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from aiogram.types import CallbackQuery, FSInputFile, InputMediaPhoto, InputMediaVideo, Message
+
+from bot.config import get_admin_ids
+from bot.db.reads import MediaRow
+from bot.storage.store import get_media_store
+
+
+def sender_is_admin(event: Message | CallbackQuery, settings) -> bool:
+    admin_ids = get_admin_ids(settings)
+    return event.from_user is not None and event.from_user.id in admin_ids
+
+
+def sender_id(event: Message | CallbackQuery) -> int | None:
+    return event.from_user.id if event.from_user is not None else None
+
+
+def media_source(media: MediaRow) -> FSInputFile | str:
+    path = get_media_store().open(media.local_path)
+    if path is not None:
+        return FSInputFile(path)
+    return media.telegram_file_id
+
+
+def build_input_media(media: MediaRow, caption: str):
+    # A preview is the file id of a smaller photo variant, used instead of the original.
+    if media.preview is not None:
+        return InputMediaPhoto(media=media.preview, caption=caption, parse_mode="HTML")
+    source = media_source(media)
+    if media.media_type == "photo":
+        return InputMediaPhoto(media=source, caption=caption, parse_mode="HTML")
+    return InputMediaVideo(media=source, caption=caption, parse_mode="HTML")
@@ -3,33 +3,65 @@ from __future__ import annotations
 from datetime import datetime
 
 from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 import html
 
 from aiogram.types import (
     CallbackQuery,
-    FSInputFile,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
-    InputMediaPhoto,
-    InputMediaVideo,
     Message,
 )
-from sqlalchemy import and_, func, select
+from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
-from bot.config import get_admin_ids, get_settings
+from bot.cache import invalidate_media
+from bot.config import get_settings
+from bot.db.catalog import (
+    filter_criteria,
+    load_browse_page,
+    load_page,
+    page_count,
+    visibility_criteria,
+)
+from bot.db.dialect import id_in
 from bot.db.models import MediaContent, Tag
-from bot.db.session import get_session
+from bot.db.reads import (
+    NEWEST_FIRST,
+    POPULAR_FIRST,
+    MediaRow,
+    fetch_archived,
+    fetch_media,
+    fetch_page,
+)
+from bot.db.session import get_read_session, get_session, mark_write
+from bot.db.variants import Preview
+from bot.handlers.helpers import build_input_media, media_source, sender_id, sender_is_admin
+from bot.similarity import forget_media, get_similarity_index, index_media
 from bot.states.actions import ActionStates
+from bot.storage.store import get_media_store
+from bot.tag_stats import TagDelta
+from bot.utils.coalesce import LatestOnly
+from bot.utils.dispatch import CallbackRoutes, Route
 from bot.utils.parsing import parse_filter_args
 from bot.utils.tags import extract_tags
+from bot.views import view_counter
 
 
 router = Router()
+callbacks = CallbackRoutes()
 
 PAGE_SIZE = 10
 BROWSE_PAGE_SIZE = 1
+BROWSE_DEBOUNCE = 0.3
+# Smallest photo side worth sending as a feed item; Telegram keeps sizes up to 2560.
+BROWSE_PREVIEW = Preview(min_side=800)
+SIMILAR_LIMIT = 10
+# Callback prefix -> feed ordering; the prefix is reused for the navigation buttons.
+BROWSE_MODES = {"browse": NEWEST_FIRST, "top": POPULAR_FIRST}
+
+_browse_renders = LatestOnly("browse", delay=BROWSE_DEBOUNCE)
 
 
 @router.message(Command("list"))
@@ -37,6 +69,11 @@ async def browse_media(message: Message) -> None:
     await _send_browse_page(message, page=1)
 
 
+@router.message(Command("top"))
+async def browse_popular_media(message: Message) -> None:
+    await _send_browse_page(message, page=1, mode="top")
+
+
 @router.message(Command("ids"))
 async def list_media_ids(message: Message) -> None:
     args = message.text.split(maxsplit=1)
@@ -49,21 +86,15 @@ async def send_ids_page(message: Message, page: int) -> None:
     page = max(page, 1)
 
     settings = get_settings()
-    is_admin = _is_admin(message, settings)
-    async_session = get_session()
+    is_admin = sender_is_admin(message, settings)
+    async_session = get_read_session(sender_id(message))
     async with async_session() as session:
-        count_query = select(func.count(MediaContent.id))
-        if not is_admin and settings.moderation_enabled:
-            count_query = count_query.where(MediaContent.is_approved.is_(True))
-        total = await session.scalar(count_query)
-        total = total or 0
-        offset = (page - 1) * PAGE_SIZE
-        query = select(MediaContent).order_by(MediaContent.created_at.desc())
-        if not is_admin and settings.moderation_enabled:
-            query = query.where(MediaContent.is_approved.is_(True))
-        query = query.offset(offset).limit(PAGE_SIZE)
-        result = await session.execute(query)
-        items = result.scalars().all()
+        items, page, pages = await load_browse_page(
+            session,
+            page,
+            PAGE_SIZE,
+            only_approved=not is_admin and settings.moderation_enabled,
+        )
 
     if not items:
         await message.answer("Список пуст.")
@@ -77,7 +108,6 @@ async def send_ids_page(message: Message, page: int) -> None:
         created = item.created_at.strftime("%Y-%m-%d %H:%M")
         lines.append(f"<b>{item.id}</b> | {created} | {preview}")
 
-    pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
     await message.answer(
         "<b>Список ID</b>:\n" + "\n".join(lines) + f"\nСтр. {page}/{pages}"
     )
@@ -166,13 +196,25 @@ async def delete_media(message: Message) -> None:
     media_id = int(args[1])
     async_session = get_session()
     async with async_session() as session:
-        media = await session.get(MediaContent, media_id)
+        media = await session.get(
+            MediaContent, media_id, options=[selectinload(MediaContent.tags)]
+        )
         if not media:
             await message.answer("Запись не найдена.")
             return
+        local_path = media.local_path
+        tag_delta = TagDelta()
+        if media.is_approved:
+            tag_delta.add(media.tags, -1)
+        await tag_delta.write(session)
         await session.delete(media)
         await session.commit()
+    tag_delta.publish()
 
+    mark_write(sender_id(message))
+    invalidate_media()
+    forget_media([media_id])
+    await get_media_store().release([local_path])
     await message.answer("Запись удалена.")
 
 
@@ -193,15 +235,14 @@ async def edit_media(message: Message) -> None:
 
 async def _send_media_by_id(message: Message, media_id: int) -> None:
     settings = get_settings()
-    is_admin = _is_admin(message, settings)
-    async_session = get_session()
+    is_admin = sender_is_admin(message, settings)
+    async_session = get_read_session(sender_id(message))
     async with async_session() as session:
-        result = await session.execute(
-            select(MediaContent)
-            .options(selectinload(MediaContent.tags))
-            .where(MediaContent.id == media_id)
-        )
-        media = result.scalar_one_or_none()
+        media = await fetch_media(session, media_id)
+        if media is None:
+            media = await fetch_archived(session, media_id)
+        else:
+            view_counter.record(media.id)
 
     if not media:
         await message.answer("Запись не найдена.")
@@ -215,39 +256,14 @@ async def _send_media_by_id(message: Message, media_id: int) -> None:
 
 async def _run_filter(message: Message, params) -> None:
     settings = get_settings()
-    is_admin = _is_admin(message, settings)
-    async_session = get_session()
+    is_admin = sender_is_admin(message, settings)
+    async_session = get_read_session(sender_id(message))
     async with async_session() as session:
-        query = (
-            select(MediaContent)
-            .options(selectinload(MediaContent.tags))
-            .order_by(MediaContent.created_at.desc())
+        criteria = filter_criteria(params, not is_admin and settings.moderation_enabled)
+        items, page, total = await load_page(
+            session, criteria, params.page, PAGE_SIZE, with_tags=False
         )
-        count_query = select(func.count(func.distinct(MediaContent.id)))
-
-        if params.tags:
-            query = query.join(MediaContent.tags).where(Tag.name.in_(params.tags))
-            count_query = count_query.join(MediaContent.tags).where(Tag.name.in_(params.tags))
-
-        date_filters = []
-        if params.start_dt:
-            date_filters.append(MediaContent.created_at >= params.start_dt)
-        if params.end_dt:
-            date_filters.append(MediaContent.created_at <= params.end_dt)
-        if date_filters:
-            query = query.where(and_(*date_filters))
-            count_query = count_query.where(and_(*date_filters))
-        if not is_admin and settings.moderation_enabled:
-            query = query.where(MediaContent.is_approved.is_(True))
-            count_query = count_query.where(MediaContent.is_approved.is_(True))
-
-        total = await session.scalar(count_query)
-        total = total or 0
-        pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
-        page = min(max(params.page, 1), pages)
-        offset = (page - 1) * PAGE_SIZE
-        result = await session.execute(query.offset(offset).limit(PAGE_SIZE))
-        items = result.scalars().all()
+    pages = page_count(total, PAGE_SIZE)
 
     if not items:
         await message.answer("Ничего не найдено.")
@@ -268,20 +284,12 @@ async def _run_filter(message: Message, params) -> None:
 
 async def _search_by_text(message: Message, query_text: str) -> None:
     settings = get_settings()
-    is_admin = _is_admin(message, settings)
-    async_session = get_session()
+    is_admin = sender_is_admin(message, settings)
+    async_session = get_read_session(sender_id(message))
     async with async_session() as session:
-        query = (
-            select(MediaContent)
-            .options(selectinload(MediaContent.tags))
-            .order_by(MediaContent.created_at.desc())
-            .where(MediaContent.description.ilike(f"%{query_text}%"))
-            .limit(PAGE_SIZE)
-        )
-        if not is_admin and settings.moderation_enabled:
-            query = query.where(MediaContent.is_approved.is_(True))
-        result = await session.execute(query)
-        items = result.scalars().all()
+        criteria = visibility_criteria(not is_admin and settings.moderation_enabled)
+        criteria.append(MediaContent.description.ilike(f"%{query_text}%"))
+        items = await fetch_page(session, criteria, limit=PAGE_SIZE, with_tags=False)
 
     if not items:
         await message.answer("Ничего не найдено.")
@@ -300,17 +308,22 @@ async def _search_by_text(message: Message, query_text: str) -> None:
 
 async def _edit_media_by_id(message: Message, media_id: int, new_description: str) -> None:
     settings = get_settings()
-    is_admin = _is_admin(message, settings)
+    is_admin = sender_is_admin(message, settings)
     if settings.moderation_enabled and not is_admin:
         await message.answer("Редактирование доступно только администраторам.")
         return
 
     async_session = get_session()
     async with async_session() as session:
-        media = await session.get(MediaContent, media_id)
+        media = await session.get(
+            MediaContent, media_id, options=[selectinload(MediaContent.tags)]
+        )
         if not media:
             await message.answer("Запись не найдена.")
             return
+        tag_delta = TagDelta()
+        if media.is_approved:
+            tag_delta.add(media.tags, -1)
         media.description = new_description
         new_tags = extract_tags(new_description)
         if new_tags:
@@ -324,8 +337,16 @@ async def _edit_media_by_id(message: Message, media_id: int, new_description: st
             media.tags = []
         if settings.moderation_enabled:
             media.is_approved = is_admin
+        await session.flush()
+        if media.is_approved:
+            tag_delta.add(media.tags, 1)
+        await tag_delta.write(session)
         await session.commit()
+    tag_delta.publish()
 
+    mark_write(sender_id(message))
+    invalidate_media()
+    index_media(media_id, new_description)
     await message.answer("Описание обновлено.")
 
 
@@ -392,43 +413,36 @@ async def approve_media(message: Message) -> None:
         return
 
     settings = get_settings()
-    if not _is_admin(message, settings):
+    if not sender_is_admin(message, settings):
         await message.answer("Команда доступна только администраторам.")
         return
 
     media_id = int(args[1])
     async_session = get_session()
     async with async_session() as session:
-        media = await session.get(MediaContent, media_id)
+        media = await session.get(
+            MediaContent, media_id, options=[selectinload(MediaContent.tags)]
+        )
         if not media:
             await message.answer("Запись не найдена.")
             return
+        tag_delta = TagDelta()
+        if not media.is_approved:
+            tag_delta.add(media.tags, 1)
         media.is_approved = True
+        await tag_delta.write(session)
         await session.commit()
+    tag_delta.publish()
 
+    mark_write(sender_id(message))
+    invalidate_media()
     await message.answer("Запись одобрена.")
 
 
-async def _send_media(message: Message, media: MediaContent, is_admin: bool = False) -> None:
+async def _send_media(message: Message, media: MediaRow, is_admin: bool = False) -> None:
     caption = _build_caption(media)
     keyboard = _action_keyboard(media.id, is_admin)
-    if media.local_path:
-        file = FSInputFile(media.local_path)
-        if media.media_type == "photo":
-            await message.answer_photo(file, caption=caption, reply_markup=keyboard)
-        else:
-            await message.answer_video(file, caption=caption, reply_markup=keyboard)
-        return
-
-    if media.media_type == "photo":
-        await message.answer_photo(media.telegram_file_id, caption=caption, reply_markup=keyboard)
-    else:
-        await message.answer_video(media.telegram_file_id, caption=caption, reply_markup=keyboard)
-
-
-def _is_admin(message: Message, settings) -> bool:
-    admin_ids = get_admin_ids(settings)
-    return message.from_user is not None and message.from_user.id in admin_ids
+    await _send_media_with_caption(message, media, caption, keyboard)
 
 
 def _browse_keyboard(
@@ -436,15 +450,16 @@ def _browse_keyboard(
     total_pages: int,
     media_id: int,
     is_admin: bool,
+    mode: str = "browse",
 ) -> InlineKeyboardMarkup:
     buttons = []
     if page > 1:
         buttons.append(
-            InlineKeyboardButton(text="⬅️ Предыдущая", callback_data=f"browse:{page - 1}")
+            InlineKeyboardButton(text="⬅️ Предыдущая", callback_data=f"{mode}:{page - 1}")
         )
     if page < total_pages:
         buttons.append(
-            InlineKeyboardButton(text="Следующая ➡️", callback_data=f"browse:{page + 1}")
+            InlineKeyboardButton(text="Следующая ➡️", callback_data=f"{mode}:{page + 1}")
         )
     action_buttons = _action_buttons(media_id, is_admin)
     rows = []
@@ -455,40 +470,55 @@ def _browse_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("browse:"))
-async def browse_callback(callback: CallbackQuery) -> None:
-    page = int(callback.data.split(":", 1)[1])
-    await _send_browse_page(callback.message, page=page, callback=callback)
+@router.callback_query(callbacks.filter)
+async def callback_dispatch(callback: CallbackQuery, route: Route, payload: str) -> None:
+    await route(callback, payload)
+
+
+@callbacks("browse")
+async def browse_callback(callback: CallbackQuery, payload: str) -> None:
+    await _browse_navigate(callback, payload, mode="browse")
+
+
+@callbacks("top")
+async def top_callback(callback: CallbackQuery, payload: str) -> None:
+    await _browse_navigate(callback, payload, mode="top")
+
+
+async def _browse_navigate(callback: CallbackQuery, payload: str, mode: str) -> None:
+    if not payload.isdigit():
+        await callback.answer()
+        return
+    page = int(payload)
+    message = callback.message
+    rendered = await _browse_renders.run(
+        (message.chat.id, message.message_id),
+        lambda: _send_browse_page(message, page=page, callback=callback, mode=mode),
+    )
+    if not rendered:
+        await callback.answer()
 
 
 async def _send_browse_page(
     message: Message,
     page: int,
     callback: CallbackQuery | None = None,
+    mode: str = "browse",
 ) -> None:
     settings = get_settings()
-    is_admin = message.from_user is not None and message.from_user.id in get_admin_ids(settings)
+    event = callback or message
+    is_admin = sender_is_admin(event, settings)
 
-    async_session = get_session()
+    async_session = get_read_session(sender_id(event))
     async with async_session() as session:
-        count_query = select(func.count(MediaContent.id))
-        if not is_admin and settings.moderation_enabled:
-            count_query = count_query.where(MediaContent.is_approved.is_(True))
-        total = await session.scalar(count_query)
-        total = total or 0
-        pages = max(1, (total + BROWSE_PAGE_SIZE - 1) // BROWSE_PAGE_SIZE)
-        page = min(max(page, 1), pages)
-        offset = (page - 1) * BROWSE_PAGE_SIZE
-        query = (
-            select(MediaContent)
-            .options(selectinload(MediaContent.tags))
-            .order_by(MediaContent.created_at.desc())
+        media_items, page, pages = await load_browse_page(
+            session,
+            page,
+            BROWSE_PAGE_SIZE,
+            only_approved=not is_admin and settings.moderation_enabled,
+            order=BROWSE_MODES[mode],
+            preview=BROWSE_PREVIEW,
         )
-        if not is_admin and settings.moderation_enabled:
-            query = query.where(MediaContent.is_approved.is_(True))
-        query = query.offset(offset).limit(BROWSE_PAGE_SIZE)
-        result = await session.execute(query)
-        media_items = result.scalars().all()
 
     if not media_items:
         if callback:
@@ -499,26 +529,24 @@ async def _send_browse_page(
         return
 
     media = media_items[0]
+    view_counter.record(media.id)
     caption = _build_caption(media)
-    keyboard = _browse_keyboard(page, pages, media.id, is_admin)
+    keyboard = _browse_keyboard(page, pages, media.id, is_admin, mode)
 
     if callback:
-        media_input = _build_input_media(media, caption)
+        media_input = build_input_media(media, caption)
         try:
             await callback.message.edit_media(media=media_input, reply_markup=keyboard)
-        except Exception:
-            await callback.message.answer_media_group(
-                [_build_input_media(media, caption)]
-            )
+        except TelegramBadRequest as error:
+            if "message is not modified" not in str(error):
+                await _send_media_with_caption(callback.message, media, caption, keyboard)
         await callback.answer()
         return
 
     await _send_media_with_caption(message, media, caption, keyboard)
 
 
-
-
-def _build_caption(media: MediaContent) -> str:
+def _build_caption(media: MediaRow) -> str:
     created = media.created_at.strftime("%Y-%m-%d %H:%M")
     description = html.escape(media.description.strip())
     max_len = 900
@@ -526,7 +554,7 @@ def _build_caption(media: MediaContent) -> str:
         description = description[: max_len - 3] + "..."
     tags_line = ""
     if media.tags:
-        tags = " ".join(f"#{html.escape(tag.name)}" for tag in media.tags)
+        tags = " ".join(f"#{html.escape(tag)}" for tag in media.tags)
         tags_line = f"\n<b>Теги:</b> {tags}"
     return (
         f"🗂️ <b>Запись #{media.id}</b>\n"
@@ -536,40 +564,31 @@ def _build_caption(media: MediaContent) -> str:
     )
 
 
-def _build_input_media(media: MediaContent, caption: str):
-    if media.local_path:
-        file = FSInputFile(media.local_path)
-        if media.media_type == "photo":
-            return InputMediaPhoto(media=file, caption=caption, parse_mode="HTML")
-        return InputMediaVideo(media=file, caption=caption, parse_mode="HTML")
-    if media.media_type == "photo":
-        return InputMediaPhoto(media=media.telegram_file_id, caption=caption, parse_mode="HTML")
-    return InputMediaVideo(media=media.telegram_file_id, caption=caption, parse_mode="HTML")
-
-
 async def _send_media_with_caption(
     message: Message,
-    media: MediaContent,
+    media: MediaRow,
     caption: str,
     keyboard: InlineKeyboardMarkup | None,
 ) -> None:
-    if media.local_path:
-        file = FSInputFile(media.local_path)
-        if media.media_type == "photo":
-            await message.answer_photo(file, caption=caption, reply_markup=keyboard)
-        else:
-            await message.answer_video(file, caption=caption, reply_markup=keyboard)
+    if media.preview is not None:
+        await message.answer_photo(media.preview, caption=caption, reply_markup=keyboard)
         return
+    source = media_source(media)
     if media.media_type == "photo":
-        await message.answer_photo(media.telegram_file_id, caption=caption, reply_markup=keyboard)
+        await message.answer_photo(source, caption=caption, reply_markup=keyboard)
     else:
-        await message.answer_video(media.telegram_file_id, caption=caption, reply_markup=keyboard)
+        await message.answer_video(source, caption=caption, reply_markup=keyboard)
 
 
 def _action_buttons(media_id: int, is_admin: bool) -> list[InlineKeyboardButton]:
     buttons = [
         InlineKeyboardButton(text="🧾 ID", callback_data=f"show_id:{media_id}"),
     ]
+    index = get_similarity_index()
+    if index is not None and index.ready:
+        buttons.append(
+            InlineKeyboardButton(text="🧩 Похожие", callback_data=f"similar:{media_id}")
+        )
     if is_admin:
         buttons.append(
             InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"confirm_delete:{media_id}")
@@ -598,17 +617,57 @@ async def _safe_edit_text(
         await message.edit_text(text, reply_markup=reply_markup)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("show_id:"))
-async def show_id_callback(callback: CallbackQuery) -> None:
-    media_id = int(callback.data.split(":", 1)[1])
+@callbacks("show_id")
+async def show_id_callback(callback: CallbackQuery, payload: str) -> None:
+    media_id = int(payload)
     await callback.answer(f"ID записи: {media_id}", show_alert=True)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("confirm_delete:"))
-async def confirm_delete_callback(callback: CallbackQuery) -> None:
-    media_id = int(callback.data.split(":", 1)[1])
+@callbacks("similar")
+async def similar_callback(callback: CallbackQuery, payload: str) -> None:
+    index = get_similarity_index()
+    if index is None or not index.ready or not payload.isdigit():
+        await callback.answer("Поиск похожих сейчас недоступен.", show_alert=True)
+        return
+
+    media_id = int(payload)
+    # Extra candidates make up for items the user is not allowed to see.
+    scores = dict(index.similar(media_id, SIMILAR_LIMIT * 2))
+    if not scores:
+        await callback.answer("Похожих записей не найдено.")
+        return
+
+    settings = get_settings()
+    is_admin = sender_is_admin(callback, settings)
+    async_session = get_read_session(sender_id(callback))
+    async with async_session() as session:
+        criteria = visibility_criteria(not is_admin and settings.moderation_enabled)
+        criteria.append(id_in(session, MediaContent.id, list(scores)))
+        items = await fetch_page(session, criteria, with_tags=False)
+    items.sort(key=lambda item: scores[item.id], reverse=True)
+    items = items[:SIMILAR_LIMIT]
+
+    if not items:
+        await callback.answer("Похожих записей не найдено.")
+        return
+
+    lines = []
+    for item in items:
+        preview = item.description.strip().replace("\n", " ")
+        if len(preview) > 40:
+            preview = preview[:37] + "..."
+        created = item.created_at.strftime("%Y-%m-%d %H:%M")
+        lines.append(f"<b>{item.id}</b> | {created} | {html.escape(preview)}")
+
+    await callback.message.answer(f"<b>Похожие на #{media_id}</b>:\n" + "\n".join(lines))
+    await callback.answer()
+
+
+@callbacks("confirm_delete")
+async def confirm_delete_callback(callback: CallbackQuery, payload: str) -> None:
+    media_id = int(payload)
     settings = get_settings()
-    if not _is_admin(callback, settings):
+    if not sender_is_admin(callback, settings):
         await callback.answer("Недостаточно прав.", show_alert=True)
         return
     keyboard = InlineKeyboardMarkup(
@@ -623,28 +682,40 @@ async def confirm_delete_callback(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@router.callback_query(lambda c: c.data == "delete_cancel")
-async def delete_cancel_callback(callback: CallbackQuery) -> None:
+@callbacks("delete_cancel")
+async def delete_cancel_callback(callback: CallbackQuery, payload: str) -> None:
     await callback.answer("Удаление отменено.")
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("delete:"))
-async def delete_callback(callback: CallbackQuery) -> None:
-    media_id = int(callback.data.split(":", 1)[1])
+@callbacks("delete")
+async def delete_callback(callback: CallbackQuery, payload: str) -> None:
+    media_id = int(payload)
     settings = get_settings()
-    if not _is_admin(callback, settings):
+    if not sender_is_admin(callback, settings):
         await callback.answer("Недостаточно прав.", show_alert=True)
         return
 
     async_session = get_session()
     async with async_session() as session:
-        media = await session.get(MediaContent, media_id)
+        media = await session.get(
+            MediaContent, media_id, options=[selectinload(MediaContent.tags)]
+        )
         if not media:
             await callback.answer("Запись не найдена.", show_alert=True)
             return
+        local_path = media.local_path
+        tag_delta = TagDelta()
+        if media.is_approved:
+            tag_delta.add(media.tags, -1)
+        await tag_delta.write(session)
         await session.delete(media)
         await session.commit()
+    tag_delta.publish()
 
+    mark_write(sender_id(callback))
+    invalidate_media()
+    forget_media([media_id])
+    await get_media_store().release([local_path])
     await callback.message.edit_caption("🗑️ Запись удалена.")
     await callback.answer("Удалено.")
 
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import html
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from bot.tag_stats import tag_index
+
+
+router = Router()
+
+TAGS_LIMIT = 20
+
+
+@router.message(Command("tags"))
+async def list_tags(message: Message) -> None:
+    args = message.text.split(maxsplit=1)
+    prefix = args[1].strip().lstrip("#").lower() if len(args) > 1 else ""
+    if prefix:
+        tags = tag_index.complete(prefix, TAGS_LIMIT)
+        title = f"<b>Теги на #{html.escape(prefix)}</b>"
+    else:
+        tags = tag_index.top(TAGS_LIMIT)
+        title = "<b>Популярные теги</b>"
+
+    if not tags:
+        await message.answer("Теги не найдены.")
+        return
+
+    lines = [f"#{html.escape(tag.name)} — {tag.count}" for tag in tags]
+    await message.answer(title + ":\n" + "\n".join(lines))
@@ -1,21 +1,33 @@
 from __future__ import annotations
 
-import os
-from pathlib import Path
+import asyncio
+import logging
+from datetime import datetime
 
-from aiogram import Router
-from aiogram.filters import Command
+from aiogram import F, Router
+from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from sqlalchemy import select
-
-from bot.config import get_admin_ids, get_settings
-from bot.db.models import MediaContent, Tag
-from bot.db.session import get_session
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from bot.cache import invalidate_media
+from bot.config import get_settings
+from bot.db.models import MediaContent, MediaVariant, Tag
+from bot.db.session import get_session, mark_write
+from bot.db.variants import PHOTO, THUMBNAIL, variant_values
+from bot.notifications import notify_admins
+from bot.similarity import index_media
+from bot.spool import get_upload_spool
 from bot.states.upload import UploadStates
+from bot.storage.metadata import get_metadata_stage
+from bot.storage.store import StoredFile, get_media_store
+from bot.tag_stats import TagDelta
 from bot.utils.tags import extract_tags
 
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 
 
@@ -31,25 +43,37 @@ async def upload_cancel(message: Message, state: FSMContext) -> None:
     await message.answer("Загрузка отменена. Можете начать заново: /upload")
 
 
+@router.message(
+    StateFilter(None, UploadStates.waiting_for_media),
+    F.caption,
+    F.photo | F.video,
+)
+async def receive_captioned_media(message: Message, state: FSMContext) -> None:
+    file_id, file_unique_id, media_type = _media_file(message)
+    await _save_media(
+        message,
+        file_id,
+        file_unique_id,
+        media_type,
+        message.caption,
+        _media_variants(message),
+    )
+    await state.clear()
+
+
 @router.message(UploadStates.waiting_for_media)
 async def receive_media(message: Message, state: FSMContext) -> None:
-    if message.photo:
-        file_id = message.photo[-1].file_id
-        file_unique_id = message.photo[-1].file_unique_id
-        media_type = "photo"
-    elif message.video:
-        file_id = message.video.file_id
-        file_unique_id = message.video.file_unique_id
-        media_type = "video"
-    else:
+    if not (message.photo or message.video):
         await state.clear()
         await message.answer("Нужен именно фото или видео. Процесс отменен.")
         return
 
+    file_id, file_unique_id, media_type = _media_file(message)
     await state.update_data(
         file_id=file_id,
         file_unique_id=file_unique_id,
         media_type=media_type,
+        variants=_media_variants(message),
     )
     await state.set_state(UploadStates.waiting_for_description)
     await message.answer("Шаг 2/2: отправьте текстовое описание. /cancel — отмена.")
@@ -62,29 +86,107 @@ async def receive_description(message: Message, state: FSMContext) -> None:
         return
 
     data = await state.get_data()
-    tags = extract_tags(message.text)
+    await _save_media(
+        message,
+        data["file_id"],
+        data["file_unique_id"],
+        data["media_type"],
+        message.text,
+        data.get("variants", []),
+    )
+    await state.clear()
+
+
+def _media_file(message: Message) -> tuple[str, str, str]:
+    if message.photo:
+        return message.photo[-1].file_id, message.photo[-1].file_unique_id, "photo"
+    return message.video.file_id, message.video.file_unique_id, "video"
+
+
+def _media_variants(message: Message) -> list[dict]:
+    if message.photo:
+        return [variant_values(PHOTO, size) for size in message.photo]
+    if message.video.thumbnail:
+        return [variant_values(THUMBNAIL, message.video.thumbnail)]
+    return []
+
+
+async def _save_media(
+    message: Message,
+    file_id: str,
+    file_unique_id: str,
+    media_type: str,
+    description: str,
+    variants: list[dict],
+) -> None:
+    tags = extract_tags(description)
     local_path: str | None = None
+    stored: StoredFile | None = None
 
     settings = get_settings()
     if settings.download_files:
-        local_path = await _download_media(
+        stored = await _download_media(
             bot=message.bot,
-            file_id=data["file_id"],
-            file_unique_id=data["file_unique_id"],
-            media_type=data["media_type"],
-            base_path=settings.download_path,
+            file_id=file_id,
+            media_type=media_type,
         )
+        local_path = str(stored.path)
 
     is_approved = not settings.moderation_enabled
+    # The checksum travels with spooled records so the metadata stage need not rehash.
+    record = {
+        "telegram_file_id": file_id,
+        "telegram_file_unique_id": file_unique_id,
+        "media_type": media_type,
+        "description": description,
+        "created_at": datetime.utcnow().isoformat(),
+        "local_path": local_path,
+        "checksum": stored.digest if stored is not None else None,
+        "is_approved": is_approved,
+        "tags": tags,
+        "variants": variants,
+    }
+    spool = get_upload_spool()
+    media_id = None
+    if spool.db_available():
+        try:
+            media_id = await asyncio.wait_for(
+                _insert_media(record),
+                settings.db_write_timeout_seconds or None,
+            )
+        except (asyncio.TimeoutError, SQLAlchemyError, OSError):
+            logger.warning("Upload write failed, spooling %s", file_unique_id, exc_info=True)
+            spool.db_failed()
+    if media_id is None:
+        await spool.append(record)
+        await message.answer("База данных недоступна: контент сохранен и появится в каталоге чуть позже.")
+        return
+
+    mark_write(message.from_user.id if message.from_user else None)
+    invalidate_media()
+    index_media(media_id, description)
+    if stored is not None:
+        get_metadata_stage().schedule(media_id, local_path, stored.digest)
+        await get_media_store().enforce_quota()
+    if is_approved:
+        await message.answer("Контент сохранен.")
+    else:
+        await message.answer("Контент сохранен и отправлен на модерацию.")
+
+    await notify_admins(message.bot, settings, media_id=media_id, description=description)
+
+
+async def _insert_media(record: dict) -> int:
+    tags = record["tags"]
     async_session = get_session()
     async with async_session() as session:
         media = MediaContent(
-            telegram_file_id=data["file_id"],
-            telegram_file_unique_id=data["file_unique_id"],
-            media_type=data["media_type"],
-            description=message.text,
-            local_path=local_path,
-            is_approved=is_approved,
+            telegram_file_id=record["telegram_file_id"],
+            telegram_file_unique_id=record["telegram_file_unique_id"],
+            media_type=record["media_type"],
+            description=record["description"],
+            local_path=record["local_path"],
+            is_approved=record["is_approved"],
         )
         if tags:
             existing = await session.execute(select(Tag).where(Tag.name.in_(tags)))
@@ -93,44 +195,26 @@ async def receive_description(message: Message, state: FSMContext) -> None:
                 media.tags.append(existing_tags.get(tag_name) or Tag(name=tag_name))
 
         session.add(media)
+        await session.flush()
+        if record["variants"]:
+            await session.execute(
+                insert(MediaVariant),
+                [{**variant, "media_id": media.id} for variant in record["variants"]],
+            )
+        tag_delta = TagDelta()
+        if record["is_approved"] and tags:
+            tag_delta.add(media.tags, 1)
+            await tag_delta.write(session)
         await session.commit()
-
-    await state.clear()
-    if is_approved:
-        await message.answer("Контент сохранен.")
-    else:
-        await message.answer("Контент сохранен и отправлен на модерацию.")
-
-    await _notify_admins(message, settings, media_id=media.id, description=message.text)
-
-
-async def _notify_admins(message: Message, settings, media_id: int, description: str) -> None:
-    if not settings.moderation_enabled:
-        return
-    admin_ids = get_admin_ids(settings)
-    if not admin_ids:
-        return
-    preview = description.strip().replace("\n", " ")
-    if len(preview) > 60:
-        preview = preview[:57] + "..."
-    text = f"Новая запись на модерации: {media_id}\n{preview}\n/approve {media_id}"
-    for admin_id in admin_ids:
-        try:
-            await message.bot.send_message(admin_id, text)
-        except Exception:
-            continue
+    tag_delta.publish()
+    return media.id
 
 
 async def _download_media(
     bot,
     file_id: str,
-    file_unique_id: str,
     media_type: str,
-    base_path: str,
-) -> str:
-    Path(base_path).mkdir(parents=True, exist_ok=True)
+) -> StoredFile:
     ext = "jpg" if media_type == "photo" else "mp4"
-    target_path = os.path.join(base_path, f"{file_unique_id}.{ext}")
-    await bot.download(file_id, destination=target_path)
-    return target_path
+    return await get_media_store().save_download(bot, file_id, ext)
 
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import IO, Iterator
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.dialect import upsert_insert
+from bot.db.models import MediaArchive, MediaContent, MediaTag, MediaVariant, Tag
+from bot.db.schema import prepare_schema
+from bot.db.session import get_engine, get_session, get_session_factory, set_session_factory
+from bot.export import RateReporter, detect_format
+from bot.tag_stats import rebuild_tag_stats
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FIELDS = [
+    "telegram_file_id",
+    "telegram_file_unique_id",
+    "media_type",
+    "description",
+    "created_at",
+    "local_path",
+    "is_approved",
+    "view_count",
+    "file_size",
+    "checksum",
+    "width",
+    "height",
+    "duration",
+]
+INTEGER_FIELDS = ("view_count", "file_size", "width", "height")
+
+
+def read_records(handle: IO[str], fmt: str) -> Iterator[dict]:
+    if fmt == "jsonl":
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for row in csv.DictReader(handle):
+        row["tags"] = row.get("tags", "").split()
+        row["is_approved"] = row.get("is_approved", "True").lower() in ("1", "true", "t", "yes")
+        row["id"] = int(row["id"]) if row.get("id") else None
+        row["local_path"] = row.get("local_path") or None
+        for field in INTEGER_FIELDS:
+            row[field] = int(row[field]) if row.get(field) else None
+        row["duration"] = float(row["duration"]) if row.get("duration") else None
+        row["checksum"] = row.get("checksum") or None
+        row["variants"] = json.loads(row["variants"]) if row.get("variants") else []
+        row["archived"] = row.get("archived", "").lower() in ("1", "true", "t", "yes")
+        row["archived_at"] = row.get("archived_at") or None
+        yield row
+
+
+def _media_values(record: dict, keep_ids: bool) -> dict:
+    values = {field: record.get(field) for field in MEDIA_FIELDS}
+    created_at = values["created_at"]
+    values["created_at"] = datetime.fromisoformat(created_at) if created_at else datetime.utcnow()
+    if values["is_approved"] is None:
+        values["is_approved"] = True
+    if values["view_count"] is None:
+        values["view_count"] = 0
+    if keep_ids:
+        values["id"] = int(record["id"])
+    return values
+
+
+async def resolve_tags(session: AsyncSession, names: set[str]) -> dict[str, int]:
+    if not names:
+        return {}
+    rows = [{"name": name} for name in sorted(names)]
+    dialect_insert = upsert_insert(session)
+
+    if dialect_insert is not None:
+        await session.execute(dialect_insert(Tag).on_conflict_do_nothing(index_elements=["name"]), rows)
+    else:
+        existing = set((await session.execute(select(Tag.name).where(Tag.name.in_(names)))).scalars())
+        missing = [row for row in rows if row["name"] not in existing]
+        if missing:
+            await session.execute(insert(Tag), missing)
+
+    result = await session.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names)))
+    return dict(result.all())
+
+
+async def import_batch(
+    session: AsyncSession,
+    records: list[dict],
+    keep_ids: bool,
+    use_copy: bool,
+) -> list[tuple[int, dict]]:
+    unique_ids = {record["telegram_file_unique_id"] for record in records}
+    existing = set(
+        (
+            await session.execute(
+                select(MediaContent.telegram_file_unique_id).where(
+                    MediaContent.telegram_file_unique_id.in_(unique_ids)
+                )
+            )
+        ).scalars()
+    )
+    # Already imported rows are skipped, so a resumed run may safely replay a batch.
+    fresh = []
+    for record in records:
+        if record["telegram_file_unique_id"] in existing:
+            continue
+        existing.add(record["telegram_file_unique_id"])
+        fresh.append(record)
+    if not fresh:
+        return []
+
+    tag_ids = await resolve_tags(session, {tag.lower() for record in fresh for tag in record.get("tags") or []})
+    values = [_media_values(record, keep_ids) for record in fresh]
+
+    if use_copy:
+        media_ids = [value["id"] for value in values]
+        raw = await (await session.connection()).get_raw_connection()
+        columns = ["id", *MEDIA_FIELDS]
+        await raw.driver_connection.copy_records_to_table(
+            MediaContent.__tablename__,
+            records=[tuple(value[column] for column in columns) for value in values],
+            columns=columns,
+        )
+    else:
+        result = await session.execute(
+            insert(MediaContent).returning(MediaContent.id, sort_by_parameter_order=True),
+            values,
+        )
+        media_ids = list(result.scalars())
+
+    links = [
+        {"media_id": media_id, "tag_id": tag_ids[tag.lower()]}
+        for media_id, record in zip(media_ids, fresh)
+        for tag in dict.fromkeys(tag.lower() for tag in record.get("tags") or [])
+    ]
+    if links:
+        await session.execute(insert(MediaTag), links)
+    variants = [
+        {**variant, "media_id": media_id}
+        for media_id, record in zip(media_ids, fresh)
+        for variant in record.get("variants") or []
+    ]
+    if variants:
+        await session.execute(insert(MediaVariant), variants)
+    return list(zip(media_ids, fresh))
+
+
+async def import_archived(session: AsyncSession, records: list[dict]) -> int:
+    # Archived rows keep their ids, since /get looks them up by id; replays are skipped.
+    ids = [int(record["id"]) for record in records]
+    existing = set((await session.execute(select(MediaArchive.id).where(MediaArchive.id.in_(ids)))).scalars())
+    values = [
+        {
+            "id": media_id,
+            "telegram_file_id": record["telegram_file_id"],
+            "telegram_file_unique_id": record["telegram_file_unique_id"],
+            "media_type": record["media_type"],
+            "description": record["description"],
+            "created_at": datetime.fromisoformat(record["created_at"]),
+            "is_approved": record["is_approved"] is not False,
+            "tag_names": " ".join(sorted(tag.lower() for tag in record.get("tags") or [])),
+            "archived_at": (
+                datetime.fromisoformat(record["archived_at"]) if record.get("archived_at") else datetime.utcnow()
+            ),
+        }
+        for media_id, record in zip(ids, records)
+        if media_id not in existing
+    ]
+    if values:
+        await session.execute(insert(MediaArchive), values)
+    return len(values)
+
+
+async def import_catalog(
+    handle: IO[str],
+    fmt: str,
+    batch_size: int = 1000,
+    keep_ids: bool = False,
+    checkpoint: Path | None = None,
+) -> int:
+    skip = _read_checkpoint(checkpoint)
+    records = read_records(handle, fmt)
+    if skip:
+        logger.info("Resuming after %s records", skip)
+        records = islice(records, skip, None)
+
+    reporter = RateReporter("Import")
+    inserted = 0
+    done = skip
+    async_session = get_session()
+    async with async_session() as session:
+        use_copy = keep_ids and session.bind.dialect.name == "postgresql"
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            live = [record for record in batch if not record.get("archived")]
+            archived = [record for record in batch if record.get("archived")]
+            if live:
+                inserted += len(await import_batch(session, live, keep_ids, use_copy))
+            if archived:
+                inserted += await import_archived(session, archived)
+            await session.commit()
+            done += len(batch)
+            _write_checkpoint(checkpoint, done)
+            reporter.add(len(batch))
+
+        if keep_ids and session.bind.dialect.name == "postgresql":
+            # New uploads must not take the ids of archived rows either.
+            await session.execute(
+                text(
+                    "SELECT setval(pg_get_serial_sequence('media_content', 'id'), "
+                    "GREATEST(COALESCE((SELECT MAX(id) FROM media_content), 1), "
+                    "COALESCE((SELECT MAX(id) FROM media_content_archive), 1)))"
+                )
+            )
+            await session.commit()
+    reporter.report(final=True)
+    logger.info("Inserted %s new rows", inserted)
+    if inserted:
+        await rebuild_tag_stats()
+    return inserted
+
+
+def _read_checkpoint(checkpoint: Path | None) -> int:
+    if checkpoint is None or not checkpoint.exists():
+        return 0
+    value = checkpoint.read_text().strip()
+    return int(value) if value.isdigit() else 0
+
+
+def _write_checkpoint(checkpoint: Path | None, done: int) -> None:
+    if checkpoint is None:
+        return
+    tmp = checkpoint.with_suffix(checkpoint.suffix + ".tmp")
+    tmp.write_text(str(done))
+    os.replace(tmp, checkpoint)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Load a JSONL or CSV catalog dump.")
+    parser.add_argument("input", help="dump produced by python -m bot.export")
+    parser.add_argument("--format", choices=("jsonl", "csv"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--keep-ids",
+        action="store_true",
+        help="keep ids from the dump (uses COPY on Postgres)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue from <input>.checkpoint",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    checkpoint = Path(args.input + ".checkpoint")
+    if not args.resume and checkpoint.exists():
+        checkpoint.unlink()
+
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(prepare_schema)
+    set_session_factory(get_session_factory(engine))
+    try:
+        with open(args.input, encoding="utf-8", newline="") as handle:
+            await import_catalog(
+                handle,
+                detect_format(args.input, args.format),
+                batch_size=args.batch_size,
+                keep_ids=args.keep_ids,
+                checkpoint=checkpoint,
+            )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
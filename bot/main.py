@@ -1,36 +1,136 @@
+import time
+
+# Taken before the heavy imports below (SQLAlchemy, aiogram, numpy), so the report covers them.
+IMPORT_STARTED = time.perf_counter()
+
 import asyncio
 import logging
+from functools import partial
 
-from aiogram import Bot, Dispatcher
+from aiogram import Bot, Dispatcher, Router
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 from bot.config import get_settings
-from bot.db.models import Base
-from bot.db.session import get_engine, get_session_factory, set_session_factory
-from bot.handlers import common, query, upload
+from bot.db.partitions import maintain_partitions
+from bot.db.schema import prepare_schema, schema_is_current
+from bot.db.session import (
+    get_engine,
+    get_read_engine,
+    get_session_factory,
+    set_read_session_factory,
+    set_session_factory,
+)
+from bot.maintenance import run_maintenance
+from bot.middlewares.throttling import build_throttling
+from bot.spool import drain_upload_spool
+from bot.storage.metadata import get_metadata_stage, get_process_pool, shutdown_process_pool
+from bot.storage.store import get_media_store
+from bot.tag_stats import load_tag_index
+from bot.utils.periodic import BackgroundTasks
+from bot.utils.startup import StartupReport
+from bot.views import view_counter
+
+IMPORT_FINISHED = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+
+def load_routers() -> list[Router]:
+    from bot.handlers import admin, common, gallery, query, tags, upload
+
+    return [
+        common.router,
+        upload.router,
+        query.router,
+        gallery.router,
+        tags.router,
+        admin.router,
+    ]
 
 
-async def init_db() -> None:
+async def init_db(defer_schema: bool = False) -> tuple[AsyncEngine, AsyncEngine | None, bool]:
     engine = get_engine()
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        if defer_schema and await conn.run_sync(schema_is_current):
+            deferred = True
+        else:
+            await conn.run_sync(prepare_schema)
+            deferred = False
     set_session_factory(get_session_factory(engine))
+    read_engine = get_read_engine()
+    if read_engine is not None:
+        set_read_session_factory(get_session_factory(read_engine))
+    return engine, read_engine, deferred
+
+
+async def prepare_schema_later(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(prepare_schema)
 
 
 async def main() -> None:
     logging.basicConfig(level=logging.INFO)
     settings = get_settings()
+    report = StartupReport(started=IMPORT_STARTED)
+    report.add("import", IMPORT_FINISHED - IMPORT_STARTED)
+
+    with report.phase("import"):
+        routers = load_routers()
+        from bot.warmup import prewarm_pool, warm_up
 
-    await init_db()
+    with report.phase("db"):
+        engine, read_engine, schema_deferred = await init_db(defer_schema=settings.fast_start)
+        await asyncio.gather(
+            prewarm_pool(engine),
+            *([prewarm_pool(read_engine)] if read_engine is not None else []),
+        )
+
+    with report.phase("workers"):
+        get_process_pool()
 
     bot = Bot(token=settings.bot_token, parse_mode="HTML")
     dispatcher = Dispatcher()
-    dispatcher.include_router(common.router)
-    dispatcher.include_router(upload.router)
-    dispatcher.include_router(query.router)
+    throttling = build_throttling(settings)
+    dispatcher.message.outer_middleware(throttling)
+    dispatcher.callback_query.outer_middleware(throttling)
+    for router in routers:
+        dispatcher.include_router(router)
+
+    async def background_warm_up() -> None:
+        try:
+            if schema_deferred:
+                with report.phase("schema"):
+                    await prepare_schema_later(engine)
+            with report.phase("warm-up"):
+                await warm_up()
+        except Exception:
+            logger.exception("Background warm-up failed")
+            return
+        report.log("warm-up finished")
 
-    await dispatcher.start_polling(bot)
+    tasks = BackgroundTasks()
+    tasks.spawn("warm-up", background_warm_up())
+    tasks.spawn("file-cleanup", get_media_store().run_release_worker())
+    tasks.spawn("metadata", get_metadata_stage().run_worker())
+    tasks.every("maintenance", settings.maintenance_interval_minutes * 60, run_maintenance)
+    tasks.every("tag-index", 600, load_tag_index)
+    tasks.every("views", settings.view_flush_seconds, view_counter.flush)
+    tasks.every(
+        "upload-spool",
+        settings.spool_drain_interval_seconds,
+        partial(drain_upload_spool, bot),
+        initial_delay=0,
+    )
+    if settings.partitioning_enabled and engine.dialect.name == "postgresql":
+        tasks.every("partitions", 24 * 3600, maintain_partitions)
+    report.log("ready to poll")
+    try:
+        await dispatcher.start_polling(bot)
+    finally:
+        await tasks.stop()
+        await view_counter.flush()
+        shutdown_process_pool()
 
 
 if __name__ == "__main__":
     asyncio.run(main())
-
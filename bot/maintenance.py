@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, select, text
+
+from bot.cache import invalidate_media, invalidate_tags
+from bot.config import get_settings
+from bot.db.models import MediaContent, MediaTag, Tag
+from bot.db.session import get_session
+from bot.retention import archive_expired_media
+from bot.similarity import forget_media
+from bot.storage.store import get_media_store
+
+
+logger = logging.getLogger(__name__)
+
+ANALYZE_THRESHOLD = 1000
+
+
+@dataclass
+class MaintenanceReport:
+    orphan_tags: int = 0
+    rejected_media: int = 0
+    archived_media: int = 0
+    freed_bytes: int = 0
+    analyzed: list[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"orphan tags removed: {self.orphan_tags}, "
+            f"rejected media purged: {self.rejected_media}, "
+            f"media archived: {self.archived_media}, "
+            f"freed bytes: {self.freed_bytes}, "
+            f"analyzed: {', '.join(self.analyzed) or '-'}, "
+            f"took {self.duration:.2f}s"
+        )
+
+
+async def run_maintenance() -> MaintenanceReport:
+    settings = get_settings()
+    started = time.perf_counter()
+    report = MaintenanceReport()
+
+    if settings.moderation_enabled and settings.rejected_retention_days > 0:
+        cutoff = datetime.utcnow() - timedelta(days=settings.rejected_retention_days)
+        report.rejected_media, report.freed_bytes = await purge_rejected_media(
+            cutoff, settings.maintenance_batch_size
+        )
+    report.archived_media = await archive_expired_media(
+        settings.retention_days,
+        settings.retention_max_rows,
+        settings.maintenance_batch_size,
+    )
+    report.orphan_tags = await delete_orphan_tags(settings.maintenance_batch_size)
+    if report.rejected_media or report.archived_media:
+        invalidate_media()
+    if report.orphan_tags:
+        invalidate_tags()
+
+    tables = []
+    if report.rejected_media + report.archived_media >= ANALYZE_THRESHOLD:
+        tables.extend([MediaContent.__tablename__, MediaTag.__tablename__])
+    if report.orphan_tags >= ANALYZE_THRESHOLD:
+        tables.append(Tag.__tablename__)
+    if tables:
+        await analyze_tables(tables)
+        report.analyzed = tables
+
+    report.duration = time.perf_counter() - started
+    logger.info("Maintenance finished: %s", report.summary())
+    return report
+
+
+async def delete_orphan_tags(batch_size: int) -> int:
+    orphan_ids = (
+        select(Tag.id)
+        .where(~exists().where(MediaTag.tag_id == Tag.id))
+        .limit(batch_size)
+    )
+    removed = 0
+    async_session = get_session()
+    async with async_session() as session:
+        while True:
+            ids = (await session.execute(orphan_ids)).scalars().all()
+            if not ids:
+                break
+            await session.execute(delete(Tag).where(Tag.id.in_(ids)))
+            await session.commit()
+            removed += len(ids)
+            if len(ids) < batch_size:
+                break
+    return removed
+
+
+async def purge_rejected_media(cutoff: datetime, batch_size: int) -> tuple[int, int]:
+    query = (
+        select(MediaContent.id, MediaContent.local_path)
+        .where(MediaContent.is_approved.is_(False), MediaContent.created_at < cutoff)
+        .limit(batch_size)
+    )
+    removed = 0
+    local_paths: list[str] = []
+    async_session = get_session()
+    async with async_session() as session:
+        while True:
+            rows = (await session.execute(query)).all()
+            if not rows:
+                break
+            await session.execute(
+                delete(MediaContent).where(MediaContent.id.in_([row.id for row in rows]))
+            )
+            await session.commit()
+            forget_media(row.id for row in rows)
+            removed += len(rows)
+            local_paths.extend(row.local_path for row in rows if row.local_path)
+            if len(rows) < batch_size:
+                break
+
+    freed = await get_media_store().release(local_paths)
+    return removed, freed
+
+
+async def analyze_tables(tables: list[str]) -> None:
+    async_session = get_session()
+    async with async_session() as session:
+        conn = await session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+        for table in tables:
+            if conn.dialect.name == "postgresql":
+                await conn.execute(text(f"VACUUM (ANALYZE) {table}"))
+            else:
+                await conn.execute(text(f"ANALYZE {table}"))
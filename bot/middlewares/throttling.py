@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from bot.utils.metrics import metrics
+
+
+BROWSE = "browse"
+SEARCH = "search"
+DEFAULT = "default"
+
+BROWSE_COMMANDS = ("/list", "/top", "/gallery", "/ids", "/get")
+SEARCH_COMMANDS = ("/search", "/filter")
+BROWSE_BUTTONS = {"🖼️ Лента", "🔎 Список ID"}
+BROWSE_CALLBACKS = {"browse", "top", "gallery", "similar"}
+
+
+@dataclass(slots=True)
+class TokenBucket:
+    tokens: float
+    updated: float
+    warned: bool = False
+
+
+@dataclass(frozen=True)
+class Limit:
+    per_minute: float
+    burst: int
+
+
+def classify(event: TelegramObject) -> str:
+    if isinstance(event, CallbackQuery):
+        prefix = (event.data or "").partition(":")[0]
+        return BROWSE if prefix in BROWSE_CALLBACKS else DEFAULT
+    if isinstance(event, Message) and event.text:
+        if event.text in BROWSE_BUTTONS:
+            return BROWSE
+        command = event.text.split(maxsplit=1)[0].split("@", 1)[0]
+        if command in BROWSE_COMMANDS:
+            return BROWSE
+        if command in SEARCH_COMMANDS:
+            return SEARCH
+    return DEFAULT
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, limits: dict[str, Limit], max_buckets: int = 10_000) -> None:
+        self.limits = limits
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[tuple[int, str], TokenBucket] = OrderedDict()
+
+    def allow(self, user_id: int, kind: str, now: float | None = None) -> tuple[bool, TokenBucket | None]:
+        limit = self.limits.get(kind)
+        if limit is None:
+            return True, None
+        now = time.monotonic() if now is None else now
+        key = (user_id, kind)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(tokens=float(limit.burst), updated=now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+                metrics.inc("throttle.evicted")
+        else:
+            self._buckets.move_to_end(key)
+            elapsed = now - bucket.updated
+            bucket.tokens = min(limit.burst, bucket.tokens + elapsed * limit.per_minute / 60)
+            bucket.updated = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.warned = False
+            return True, bucket
+        return False, bucket
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        kind = classify(event)
+        allowed, bucket = self.allow(user.id, kind)
+        if allowed:
+            return await handler(event, data)
+
+        metrics.inc(f"throttle.dropped.{kind}")
+        # Only the first rejected update of a burst gets a reply, the rest are dropped.
+        if bucket is not None and not bucket.warned:
+            bucket.warned = True
+            if isinstance(event, CallbackQuery):
+                await event.answer("Слишком часто, подождите немного.")
+            elif isinstance(event, Message):
+                await event.answer("Слишком много запросов, попробуйте через несколько секунд.")
+        elif isinstance(event, CallbackQuery):
+            await event.answer()
+        return None
+
+
+def build_throttling(settings) -> ThrottlingMiddleware:
+    burst = settings.throttle_burst
+    limits = {
+        BROWSE: Limit(settings.throttle_browse_per_minute, burst),
+        SEARCH: Limit(settings.throttle_search_per_minute, burst),
+        DEFAULT: Limit(settings.throttle_default_per_minute, burst * 2),
+    }
+    return ThrottlingMiddleware(
+        {kind: limit for kind, limit in limits.items() if limit.per_minute > 0},
+        max_buckets=settings.throttle_max_users,
+    )
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from aiogram import Bot
+
+from bot.config import get_admin_ids
+
+
+async def notify_admins(bot: Bot, settings, media_id: int, description: str) -> None:
+    if not settings.moderation_enabled:
+        return
+    admin_ids = get_admin_ids(settings)
+    if not admin_ids:
+        return
+    preview = description.strip().replace("\n", " ")
+    if len(preview) > 60:
+        preview = preview[:57] + "..."
+    text = f"Новая запись на модерации: {media_id}\n{preview}\n/approve {media_id}"
+    for admin_id in admin_ids:
+        try:
+            await bot.send_message(admin_id, text)
+        except Exception:
+            continue
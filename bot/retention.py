@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.archive import copy_to_archive
+from bot.db.dialect import id_in
+from bot.db.models import MediaContent, MediaTag, MediaVariant
+from bot.db.session import get_session
+from bot.similarity import forget_media
+from bot.storage.store import get_media_store
+from bot.tag_stats import tag_delta_for_media
+
+
+logger = logging.getLogger(__name__)
+
+
+async def archive_expired_media(retention_days: int, max_rows: int, batch_size: int) -> int:
+    if retention_days <= 0 and max_rows <= 0:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days) if retention_days > 0 else None
+    archived = 0
+    async_session = get_session()
+    async with async_session() as session:
+        over_budget = 0
+        if max_rows > 0:
+            live = await session.scalar(select(func.count(MediaContent.id))) or 0
+            over_budget = max(0, live - max_rows)
+
+        # Rows whose id is already archived stay live and are not picked again.
+        skipped: set[int] = set()
+        while True:
+            query = select(MediaContent.id).order_by(MediaContent.created_at, MediaContent.id)
+            if skipped:
+                query = query.where(MediaContent.id.not_in(skipped))
+            if over_budget > archived:
+                limit = min(batch_size, over_budget - archived)
+            elif cutoff is not None:
+                query = query.where(MediaContent.created_at < cutoff)
+                limit = batch_size
+            else:
+                break
+            ids = list((await session.execute(query.limit(limit))).scalars())
+            if not ids:
+                break
+            done = await archive_batch(session, ids)
+            skipped.update(set(ids) - set(done))
+            archived += len(done)
+            if len(ids) < limit:
+                break
+
+    if archived:
+        logger.info("Archived %s media rows", archived)
+    return archived
+
+
+async def archive_batch(session: AsyncSession, ids: list[int]) -> list[int]:
+    ids, local_paths = await copy_to_archive(session, ids)
+    if not ids:
+        return []
+
+    tag_delta = await tag_delta_for_media(session, ids, -1)
+    await tag_delta.write(session)
+    await session.execute(delete(MediaTag).where(id_in(session, MediaTag.media_id, ids)))
+    await session.execute(delete(MediaVariant).where(id_in(session, MediaVariant.media_id, ids)))
+    await session.execute(delete(MediaContent).where(id_in(session, MediaContent.id, ids)))
+    await session.commit()
+    tag_delta.publish()
+    forget_media(ids)
+    # Archived rows are served by telegram_file_id, local copies are not kept.
+    get_media_store().schedule_release(local_paths)
+    return ids
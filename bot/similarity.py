@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from sqlalchemy import select
+
+from bot.config import get_settings
+from bot.db.models import MediaContent
+from bot.db.session import get_read_session
+
+
+logger = logging.getLogger(__name__)
+
+# A query is one scan over the matrix and is bound by memory bandwidth:
+# 64 float32 columns keep 1M items at 256 MiB, about 30 ms per scan on one core.
+DIMENSIONS = 64
+NGRAM = 3
+MIN_CAPACITY = 1024
+LOAD_BATCH = 10_000
+
+
+def embed(text: str) -> "np.ndarray":
+    normalized = f" {' '.join(text.lower().split())} "
+    digests = np.fromiter(
+        (
+            zlib.crc32(normalized[start : start + NGRAM].encode())
+            for start in range(max(len(normalized) - NGRAM + 1, 0))
+        ),
+        dtype=np.uint32,
+    )
+    # Low bits pick the bucket, the top bit the sign, so collisions cancel out on average.
+    signs = np.where(digests >> 31, 1.0, -1.0)
+    vector = np.bincount(digests % DIMENSIONS, weights=signs, minlength=DIMENSIONS).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+class SimilarityIndex:
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path
+        self.ready = False
+        self._ids = np.full(0, -1, dtype=np.int64)
+        self._vectors = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self._rows: dict[int, int] = {}
+        self._free: list[int] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def clear(self) -> None:
+        self._ids[: self._size] = -1
+        self._vectors[: self._size] = 0
+        self._rows.clear()
+        self._free.clear()
+        self._size = 0
+
+    def upsert(self, media_id: int, text: str) -> None:
+        self.put(media_id, embed(text))
+
+    def put(self, media_id: int, vector: "np.ndarray") -> None:
+        row = self._rows.get(media_id)
+        if row is None:
+            row = self._free.pop() if self._free else self._next_row()
+            self._rows[media_id] = row
+            self._ids[row] = media_id
+        self._vectors[row] = vector
+
+    def remove(self, media_id: int) -> None:
+        row = self._rows.pop(media_id, None)
+        if row is None:
+            return
+        # A zero vector scores 0 against everything and never makes the top k.
+        self._ids[row] = -1
+        self._vectors[row] = 0
+        self._free.append(row)
+
+    def similar(self, media_id: int, limit: int) -> list[tuple[int, float]]:
+        row = self._rows.get(media_id)
+        if row is None:
+            return []
+        return self.search(self._vectors[row], limit, exclude=media_id)
+
+    def search(self, vector: "np.ndarray", limit: int, exclude: int | None = None) -> list[tuple[int, float]]:
+        if not self._rows or limit <= 0:
+            return []
+        scores = self._vectors[: self._size] @ vector
+        count = min(limit + 1, self._size)
+        top = np.argpartition(scores, self._size - count)[self._size - count :]
+        top = top[np.argsort(scores[top])[::-1]]
+        matches = []
+        for row in top:
+            media_id = int(self._ids[row])
+            if media_id < 0 or media_id == exclude or scores[row] <= 0:
+                continue
+            matches.append((media_id, float(scores[row])))
+        return matches[:limit]
+
+    def _next_row(self) -> int:
+        if self._size == len(self._ids):
+            self._grow(max(MIN_CAPACITY, 2 * self._size))
+        self._size += 1
+        return self._size - 1
+
+    def _grow(self, capacity: int) -> None:
+        ids = self._allocate("ids", (capacity,), np.int64)
+        ids[:] = -1
+        ids[: self._size] = self._ids[: self._size]
+        vectors = self._allocate("vectors", (capacity, DIMENSIONS), np.float32)
+        vectors[: self._size] = self._vectors[: self._size]
+        if self.path is not None:
+            # Swapped in whole, so a crash mid-grow never leaves a truncated file behind.
+            for name, array in (("ids", ids), ("vectors", vectors)):
+                array.flush()
+                os.replace(self._file(name, tmp=True), self._file(name))
+        self._ids, self._vectors = ids, vectors
+
+    def _allocate(self, name: str, shape: tuple[int, ...], dtype) -> "np.ndarray":
+        if self.path is None:
+            return np.zeros(shape, dtype=dtype)
+        self.path.mkdir(parents=True, exist_ok=True)
+        return np.lib.format.open_memmap(self._file(name, tmp=True), mode="w+", dtype=dtype, shape=shape)
+
+    def _file(self, name: str, tmp: bool = False) -> Path:
+        return self.path / (f"{name}.npy.tmp" if tmp else f"{name}.npy")
+
+
+_index: SimilarityIndex | None = None
+_lock = None
+
+
+def _lock_directory(path: Path) -> bool:
+    # The files are rewritten in place and on every grow, so only one process may
+    # map them; a second one writing the same file can crash the first with SIGBUS.
+    global _lock
+    if fcntl is None:
+        return True
+    path.mkdir(parents=True, exist_ok=True)
+    handle = open(path / "index.lock", "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _lock = handle
+    return True
+
+
+def get_similarity_index() -> SimilarityIndex | None:
+    global _index
+    if np is None:
+        return None
+    if _index is None:
+        setting = get_settings().similarity_path
+        path = Path(setting) if setting else None
+        if path is not None and not _lock_directory(path):
+            logger.warning("%s is used by another process, similarity index stays in memory", path)
+            path = None
+        _index = SimilarityIndex(path)
+    return _index
+
+
+def index_media(media_id: int, description: str) -> None:
+    index = get_similarity_index()
+    if index is not None:
+        index.upsert(media_id, description)
+
+
+def forget_media(media_ids: Iterable[int]) -> None:
+    index = get_similarity_index()
+    if index is not None:
+        for media_id in media_ids:
+            index.remove(media_id)
+
+
+def _embed_many(texts: list[str]) -> list["np.ndarray"]:
+    return [embed(text) for text in texts]
+
+
+async def load_similarity_index() -> int:
+    index = get_similarity_index()
+    if index is None:
+        logger.info("numpy is not installed, similar items search is disabled")
+        return 0
+
+    index.ready = False
+    index.clear()
+    async_session = get_read_session()
+    async with async_session() as session:
+        result = await session.stream(
+            select(MediaContent.id, MediaContent.description).execution_options(yield_per=LOAD_BATCH)
+        )
+        async for rows in result.partitions():
+            vectors = await asyncio.to_thread(_embed_many, [row.description for row in rows])
+            for row, vector in zip(rows, vectors):
+                index.put(row.id, vector)
+    index.ready = True
+    return len(index)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+from aiogram import Bot
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from bot.cache import invalidate_media
+from bot.config import get_settings
+from bot.db.session import get_session
+from bot.importer import import_batch
+from bot.notifications import notify_admins
+from bot.similarity import index_media
+from bot.storage.metadata import get_metadata_stage
+from bot.tag_stats import tag_delta_for_media
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER_SECONDS = 30.0
+# Only these mean the database is unreachable; anything else is a problem with the data.
+OUTAGE_ERRORS = (OperationalError, InterfaceError, OSError)
+
+
+class UploadSpool:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._retry_at = 0.0
+
+    def db_available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def db_failed(self) -> None:
+        self._retry_at = time.monotonic() + RETRY_AFTER_SECONDS
+
+    async def append(self, record: dict) -> None:
+        await self._run(self._append, record)
+
+    async def pending(self) -> int:
+        return await self._run(self._pending)
+
+    async def drain(self, batch_size: int, bot: Bot | None = None) -> int:
+        inserted = 0
+        while True:
+            batch = await self._run(self._peek, batch_size)
+            if not batch:
+                break
+            try:
+                inserted += await self._import(batch, bot)
+            except OUTAGE_ERRORS:
+                self.db_failed()
+                logger.warning("Upload spool drain failed, %s records kept", len(batch), exc_info=True)
+                break
+            except Exception:
+                # A data error in one record must not hold back the rest of the spool.
+                logger.warning("Spooled batch rejected, retrying record by record", exc_info=True)
+                try:
+                    inserted += await self._import_one_by_one(batch, bot)
+                except OUTAGE_ERRORS:
+                    self.db_failed()
+                    logger.warning("Upload spool drain failed, remaining records kept", exc_info=True)
+                    break
+            self._retry_at = 0.0
+
+        if inserted:
+            logger.info("Drained %s spooled uploads", inserted)
+            invalidate_media()
+        return inserted
+
+    async def _import_one_by_one(self, batch: list[dict], bot: Bot | None) -> int:
+        inserted = 0
+        for record in batch:
+            try:
+                inserted += await self._import([record], bot)
+            except OUTAGE_ERRORS:
+                raise
+            except Exception as error:
+                logger.exception("Moving spooled upload %s to dead letters", record["telegram_file_unique_id"])
+                await self._run(self._bury, record, repr(error))
+        return inserted
+
+    async def _import(self, records: list[dict], bot: Bot | None) -> int:
+        async_session = get_session()
+        async with async_session() as session:
+            rows = await import_batch(session, records, keep_ids=False, use_copy=False)
+            tag_delta = await tag_delta_for_media(session, [media_id for media_id, _ in rows], 1)
+            await tag_delta.write(session)
+            await session.commit()
+        # Rows are removed only after the commit; a replayed batch is skipped by unique id.
+        await self._run(self._remove, [record["telegram_file_unique_id"] for record in records])
+        tag_delta.publish()
+        settings = get_settings()
+        for media_id, record in rows:
+            index_media(media_id, record["description"])
+            if record.get("local_path"):
+                get_metadata_stage().schedule(media_id, record["local_path"], record.get("checksum"))
+            if bot is not None and not record["is_approved"]:
+                await notify_admins(bot, settings, media_id, record["description"])
+        return len(rows)
+
+    async def _run(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "unique_id TEXT PRIMARY KEY, record TEXT NOT NULL, spooled_at REAL NOT NULL)"
+            )
+            # Records the database keeps rejecting; kept for a manual look, never retried.
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_uploads ("
+                "unique_id TEXT PRIMARY KEY, record TEXT NOT NULL, error TEXT NOT NULL, failed_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _append(self, record: dict) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR IGNORE INTO uploads (unique_id, record, spooled_at) VALUES (?, ?, ?)",
+            (record["telegram_file_unique_id"], json.dumps(record, ensure_ascii=False), time.time()),
+        )
+        conn.commit()
+
+    def _pending(self) -> int:
+        return self._connect().execute("SELECT count(*) FROM uploads").fetchone()[0]
+
+    def _peek(self, limit: int) -> list[dict]:
+        rows = self._connect().execute(
+            "SELECT record FROM uploads ORDER BY spooled_at LIMIT ?", (limit,)
+        )
+        return [json.loads(record) for (record,) in rows]
+
+    def _bury(self, record: dict, error: str) -> None:
+        conn = self._connect()
+        unique_id = record["telegram_file_unique_id"]
+        conn.execute(
+            "INSERT OR REPLACE INTO dead_uploads (unique_id, record, error, failed_at) VALUES (?, ?, ?, ?)",
+            (unique_id, json.dumps(record, ensure_ascii=False), error, time.time()),
+        )
+        conn.execute("DELETE FROM uploads WHERE unique_id = ?", (unique_id,))
+        conn.commit()
+
+    def _remove(self, unique_ids: list[str]) -> None:
+        conn = self._connect()
+        conn.executemany("DELETE FROM uploads WHERE unique_id = ?", [(unique_id,) for unique_id in unique_ids])
+        conn.commit()
+
+
+_spool: UploadSpool | None = None
+
+
+def get_upload_spool() -> UploadSpool:
+    global _spool
+    if _spool is None:
+        _spool = UploadSpool(Path(get_settings().spool_path))
+    return _spool
+
+
+async def drain_upload_spool(bot: Bot | None = None) -> int:
+    settings = get_settings()
+    return await get_upload_spool().drain(settings.maintenance_batch_size, bot)
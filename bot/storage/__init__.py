@@ -0,0 +1 @@
+"""Local media storage."""
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import select, update
+
+from bot.db.models import MediaContent
+from bot.db.session import get_engine, get_session, get_session_factory, set_session_factory
+from bot.storage.store import MediaStore, get_media_store
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+ORPHAN_MIN_AGE = 3600
+
+
+@dataclass
+class GcReport:
+    removed_files: int = 0
+    freed_bytes: int = 0
+    cleared_rows: int = 0
+    removed_tmp: int = 0
+
+
+async def collect_garbage(store: MediaStore | None = None, dry_run: bool = False) -> GcReport:
+    store = store or get_media_store()
+    report = GcReport()
+
+    referenced: set[Path] = set()
+    missing: list[int] = []
+    async_session = get_session()
+    async with async_session() as session:
+        result = await session.stream(
+            select(MediaContent.id, MediaContent.local_path)
+            .where(MediaContent.local_path.is_not(None))
+            .execution_options(yield_per=BATCH_SIZE)
+        )
+        async for media_id, local_path in result:
+            path = Path(local_path).resolve()
+            if path.exists():
+                referenced.add(path)
+            else:
+                missing.append(media_id)
+
+        if missing and not dry_run:
+            for start in range(0, len(missing), BATCH_SIZE):
+                batch = missing[start : start + BATCH_SIZE]
+                await session.execute(
+                    update(MediaContent)
+                    .where(MediaContent.id.in_(batch))
+                    .values(local_path=None)
+                )
+            await session.commit()
+    report.cleared_rows = len(missing)
+
+    deadline = time.time() - ORPHAN_MIN_AGE
+    for path in store.iter_files():
+        if path.resolve() in referenced:
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        # Fresh files may belong to an upload whose row is not committed yet.
+        if stat.st_mtime > deadline:
+            continue
+        if dry_run:
+            report.freed_bytes += stat.st_size
+        else:
+            report.freed_bytes += await asyncio.to_thread(store.remove, path)
+        report.removed_files += 1
+
+    if not dry_run:
+        report.removed_tmp = await asyncio.to_thread(store.cleanup_tmp)
+    return report
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile downloaded files with the database.")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine()
+    set_session_factory(get_session_factory(engine))
+    try:
+        report = await collect_garbage(dry_run=args.dry_run)
+    finally:
+        await engine.dispose()
+    logger.info(
+        "Removed %s orphan files (%s bytes), cleared %s missing paths, removed %s temp files",
+        report.removed_files,
+        report.freed_bytes,
+        report.cleared_rows,
+        report.removed_tmp,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+from sqlalchemy import bindparam, select, update
+
+from bot.config import get_settings
+from bot.db.models import MediaContent
+from bot.db.schema import prepare_schema
+from bot.db.session import get_engine, get_session, get_session_factory, set_session_factory
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+# JPEG start-of-frame markers carry the dimensions; C4, C8 and CC are other segments.
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_STANDALONE = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+@dataclass
+class MediaInfo:
+    file_size: int
+    checksum: str
+    width: int | None = None
+    height: int | None = None
+    duration: float | None = None
+
+
+def _map(path: str):
+    with open(path, "rb") as handle:
+        # mmap refuses empty files; callers treat None as "nothing to parse".
+        if os.fstat(handle.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def file_checksum(path: str) -> tuple[str, int]:
+    mapped = _map(path)
+    if mapped is None:
+        return hashlib.sha256().hexdigest(), 0
+    with mapped:
+        return hashlib.sha256(mapped).hexdigest(), len(mapped)
+
+
+def jpeg_dimensions(data) -> tuple[int, int] | None:
+    if data[:2] != b"\xff\xd8":
+        return None
+    offset = 2
+    end = len(data)
+    while offset + 4 <= end:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in JPEG_STANDALONE:
+            offset += 2
+            continue
+        if marker == 0xDA:
+            return None
+        (length,) = struct.unpack_from(">H", data, offset + 2)
+        if marker in JPEG_SOF and offset + 9 <= end:
+            height, width = struct.unpack_from(">HH", data, offset + 5)
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def _mp4_boxes(data, start: int, end: int):
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _mp4_child(data, start: int, end: int, kind: bytes) -> tuple[int, int] | None:
+    for child, body, child_end in _mp4_boxes(data, start, end):
+        if child == kind:
+            return body, child_end
+    return None
+
+
+def mp4_metadata(data) -> tuple[int | None, int | None, float | None]:
+    # Walks box headers only: moov sits at either end of the file and the
+    # mdat payload in between is never touched.
+    moov = _mp4_child(data, 0, len(data), b"moov")
+    if moov is None:
+        return None, None, None
+
+    duration = None
+    mvhd = _mp4_child(data, *moov, b"mvhd")
+    if mvhd is not None:
+        body = mvhd[0]
+        if data[body] == 1:
+            timescale, length = struct.unpack_from(">IQ", data, body + 20)
+        else:
+            timescale, length = struct.unpack_from(">II", data, body + 12)
+        if timescale:
+            duration = length / timescale
+
+    for kind, body, trak_end in _mp4_boxes(data, *moov):
+        if kind != b"trak":
+            continue
+        tkhd = _mp4_child(data, body, trak_end, b"tkhd")
+        if tkhd is None:
+            continue
+        # width and height are 16.16 fixed point at the end of the header.
+        size_offset = tkhd[0] + (88 if data[tkhd[0]] == 1 else 76)
+        width, height = struct.unpack_from(">II", data, size_offset)
+        if width and height:
+            return width >> 16, height >> 16, duration
+    return None, None, duration
+
+
+def describe_file(path: str, checksum: str | None = None) -> MediaInfo:
+    mapped = _map(path)
+    if mapped is None:
+        return MediaInfo(file_size=0, checksum=checksum or hashlib.sha256().hexdigest())
+    with mapped:
+        info = MediaInfo(
+            file_size=len(mapped),
+            checksum=checksum or hashlib.sha256(mapped).hexdigest(),
+        )
+        try:
+            dimensions = jpeg_dimensions(mapped)
+            if dimensions is not None:
+                info.width, info.height = dimensions
+            else:
+                info.width, info.height, info.duration = mp4_metadata(mapped)
+        except (struct.error, IndexError):
+            logger.debug("Unparsable media header in %s", path)
+    return info
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # The bot runs threads (asyncio.to_thread, aiosqlite), so workers must not be forked from it.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(
+            max_workers=get_settings().metadata_workers or None,
+            mp_context=multiprocessing.get_context(method),
+        )
+    return _pool
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def run_in_pool(func: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(get_process_pool(), func, *args)
+
+
+async def save_metadata(items: list[tuple[int, MediaInfo]]) -> None:
+    if not items:
+        return
+    table = MediaContent.__table__
+    async_session = get_session()
+    async with async_session() as session:
+        # Keys named after columns become the SET clause of the executemany.
+        await session.execute(
+            update(table).where(table.c.id == bindparam("media_id")),
+            [{"media_id": media_id, **asdict(info)} for media_id, info in items],
+        )
+        await session.commit()
+
+
+async def describe_many(rows: list[tuple[int, str, str | None]]) -> list[tuple[int, MediaInfo]]:
+    results = await asyncio.gather(
+        *(run_in_pool(describe_file, path, checksum) for _, path, checksum in rows),
+        return_exceptions=True,
+    )
+    described = []
+    for (media_id, path, _), result in zip(rows, results):
+        if isinstance(result, OSError):
+            logger.debug("Skipping metadata for %s: %s", path, result)
+        elif isinstance(result, BaseException):
+            logger.warning("Metadata extraction failed for %s", path, exc_info=result)
+        else:
+            described.append((media_id, result))
+    return described
+
+
+class MetadataStage:
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[tuple[int, str, str | None]] | None = None
+
+    def schedule(self, media_id: int, local_path: str, checksum: str | None = None) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait((media_id, local_path, checksum))
+
+    async def run_worker(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        while True:
+            rows = [await self._queue.get()]
+            while len(rows) < BATCH_SIZE and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            try:
+                await save_metadata(await describe_many(rows))
+            except Exception:
+                logger.exception("Failed to store metadata for %s files", len(rows))
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+
+_stage: MetadataStage | None = None
+
+
+def get_metadata_stage() -> MetadataStage:
+    global _stage
+    if _stage is None:
+        _stage = MetadataStage()
+    return _stage
+
+
+async def backfill_metadata(batch_size: int = BATCH_SIZE, force: bool = False) -> int:
+    query = select(MediaContent.id, MediaContent.local_path).where(MediaContent.local_path.is_not(None))
+    if not force:
+        query = query.where(MediaContent.checksum.is_(None))
+    query = query.order_by(MediaContent.id).limit(batch_size)
+
+    done = 0
+    last_id = 0
+    async_session = get_session()
+    while True:
+        async with async_session() as session:
+            rows = (await session.execute(query.where(MediaContent.id > last_id))).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        described = await describe_many([(row.id, row.local_path, None) for row in rows])
+        await save_metadata(described)
+        done += len(described)
+        logger.info("Described %s files", done)
+    return done
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Extract size, dimensions, duration and checksums of stored files.")
+    parser.add_argument("command", choices=("backfill",))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="also redo files that already have metadata")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(prepare_schema)
+    set_session_factory(get_session_factory(engine))
+    try:
+        described = await backfill_metadata(args.batch_size, force=args.force)
+    finally:
+        shutdown_process_pool()
+        await engine.dispose()
+    logger.info("Stored metadata for %s files", described)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
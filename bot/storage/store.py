@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import select, update
+
+from bot.config import get_settings
+from bot.db.models import MediaContent
+from bot.db.session import get_session
+from bot.storage.metadata import file_checksum, run_in_pool
+
+
+logger = logging.getLogger(__name__)
+
+TMP_DIR = ".tmp"
+
+
+@dataclass
+class StoredFile:
+    path: Path
+    size: int
+    digest: str
+
+
+class MediaStore:
+    def __init__(self, base_path: str, quota_bytes: int = 0) -> None:
+        self.base_path = Path(base_path)
+        self.quota_bytes = quota_bytes
+        self._usage: int | None = None
+        self._lock = asyncio.Lock()
+        self._release_queue: asyncio.Queue[list[str]] | None = None
+
+    @property
+    def tmp_path(self) -> Path:
+        return self.base_path / TMP_DIR
+
+    def path_for(self, digest: str, ext: str) -> Path:
+        return self.base_path / digest[:2] / digest[2:4] / f"{digest}.{ext}"
+
+    async def save_download(self, bot, file_id: str, ext: str) -> StoredFile:
+        self.tmp_path.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.tmp_path / f"{uuid.uuid4().hex}.part"
+        try:
+            await bot.download(file_id, destination=tmp_file)
+            # Hashing large videos runs in a worker process, off the event loop.
+            digest, size = await run_in_pool(file_checksum, str(tmp_file))
+            stored = await asyncio.to_thread(self._commit, tmp_file, ext, digest, size)
+        finally:
+            if tmp_file.exists():
+                tmp_file.unlink()
+        return stored
+
+    def open(self, local_path: str | None) -> Path | None:
+        if not local_path:
+            return None
+        path = Path(local_path)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    async def release(self, local_paths: list[str]) -> int:
+        paths = [path for path in local_paths if path]
+        if not paths:
+            return 0
+        async_session = get_session()
+        async with async_session() as session:
+            result = await session.execute(
+                select(MediaContent.local_path).where(MediaContent.local_path.in_(paths))
+            )
+            still_used = set(result.scalars().all())
+        freed = 0
+        for path in set(paths) - still_used:
+            freed += await asyncio.to_thread(self.remove, Path(path))
+        return freed
+
+    def schedule_release(self, local_paths: list[str]) -> None:
+        paths = [path for path in local_paths if path]
+        if not paths:
+            return
+        if self._release_queue is None:
+            self._release_queue = asyncio.Queue()
+        self._release_queue.put_nowait(paths)
+
+    async def run_release_worker(self) -> None:
+        if self._release_queue is None:
+            self._release_queue = asyncio.Queue()
+        while True:
+            paths = await self._release_queue.get()
+            try:
+                freed = await self.release(paths)
+                logger.info("Released %s files, freed %s bytes", len(paths), freed)
+            except Exception:
+                logger.exception("Failed to release %s local files", len(paths))
+            finally:
+                self._release_queue.task_done()
+
+    async def enforce_quota(self) -> int:
+        if self.quota_bytes <= 0:
+            return 0
+        async with self._lock:
+            if await self.usage() <= self.quota_bytes:
+                return 0
+            files = await asyncio.to_thread(self._files_by_access)
+            usage = sum(size for _, size, _ in files)
+            evicted: list[str] = []
+            for path, size, _ in files:
+                if usage <= self.quota_bytes:
+                    break
+                evicted.append(str(path))
+                usage -= size
+            if not evicted:
+                return 0
+
+            async_session = get_session()
+            async with async_session() as session:
+                await session.execute(
+                    update(MediaContent)
+                    .where(MediaContent.local_path.in_(evicted))
+                    .values(local_path=None)
+                )
+                await session.commit()
+            freed = 0
+            for path in evicted:
+                freed += await asyncio.to_thread(self.remove, Path(path))
+            logger.info("Evicted %s local files, freed %s bytes", len(evicted), freed)
+            return freed
+
+    async def usage(self) -> int:
+        if self._usage is None:
+            files = await asyncio.to_thread(self._files_by_access)
+            self._usage = sum(size for _, size, _ in files)
+        return self._usage
+
+    def iter_files(self):
+        if not self.base_path.exists():
+            return
+        for root, dirs, names in os.walk(self.base_path):
+            if Path(root) == self.base_path and TMP_DIR in dirs:
+                dirs.remove(TMP_DIR)
+            for name in names:
+                yield Path(root) / name
+
+    def _commit(self, tmp_file: Path, ext: str, digest: str, size: int) -> StoredFile:
+        with open(tmp_file, "rb") as handle:
+            os.fsync(handle.fileno())
+
+        target = self.path_for(digest, ext)
+        if target.exists():
+            os.utime(target)
+            return StoredFile(path=target, size=size, digest=digest)
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_file, target)
+        if self._usage is not None:
+            self._usage += size
+        return StoredFile(path=target, size=size, digest=digest)
+
+    def remove(self, path: Path) -> int:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        if self._usage is not None:
+            self._usage = max(0, self._usage - size)
+        return size
+
+    def _files_by_access(self) -> list[tuple[Path, int, float]]:
+        files = []
+        for path in self.iter_files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        files.sort(key=lambda item: item[2])
+        return files
+
+    def cleanup_tmp(self, max_age: float = 3600) -> int:
+        if not self.tmp_path.exists():
+            return 0
+        removed = 0
+        deadline = time.time() - max_age
+        for path in self.tmp_path.iterdir():
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+_store: MediaStore | None = None
+
+
+def get_media_store() -> MediaStore:
+    global _store
+    if _store is None:
+        settings = get_settings()
+        _store = MediaStore(
+            settings.download_path,
+            quota_bytes=settings.storage_quota_mb * 1024 * 1024,
+        )
+    return _store
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.dialect import upsert_insert
+from bot.db.models import MediaContent, MediaTag, Tag, TagStat
+from bot.db.session import get_read_session, get_session
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TagInfo:
+    name: str
+    count: int
+    last_used_at: datetime | None
+
+
+class TagIndex:
+    def __init__(self) -> None:
+        self._names: list[str] = []
+        self._info: dict[str, TagInfo] = {}
+
+    def __len__(self) -> int:
+        return len(self._info)
+
+    def load(self, rows: Iterable[tuple[str, int, datetime | None]]) -> None:
+        info = {
+            name: TagInfo(name, count, last_used_at)
+            for name, count, last_used_at in rows
+            if count > 0
+        }
+        self._info = info
+        self._names = sorted(info)
+
+    def apply(self, name: str, delta: int, when: datetime) -> None:
+        info = self._info.get(name)
+        if info is None:
+            if delta <= 0:
+                return
+            self._info[name] = TagInfo(name, delta, when)
+            bisect.insort(self._names, name)
+            return
+        info.count += delta
+        if delta > 0:
+            info.last_used_at = when
+        if info.count <= 0:
+            del self._info[name]
+            index = bisect.bisect_left(self._names, name)
+            if index < len(self._names) and self._names[index] == name:
+                del self._names[index]
+
+    def top(self, limit: int) -> list[TagInfo]:
+        return heapq.nlargest(limit, self._info.values(), key=lambda info: (info.count, info.name))
+
+    def complete(self, prefix: str, limit: int) -> list[TagInfo]:
+        start = bisect.bisect_left(self._names, prefix)
+        end = bisect.bisect_left(self._names, prefix + "\uffff")
+        matches = (self._info[name] for name in self._names[start:end])
+        return heapq.nlargest(limit, matches, key=lambda info: (info.count, info.name))
+
+
+tag_index = TagIndex()
+
+
+class TagDelta:
+    def __init__(self) -> None:
+        self._deltas: dict[int, list] = {}
+        self.when = datetime.utcnow()
+
+    def add(self, tags: Iterable[Tag], step: int) -> None:
+        for tag in tags:
+            entry = self._deltas.setdefault(tag.id, [tag.name, 0])
+            entry[1] += step
+
+    async def write(self, session: AsyncSession) -> None:
+        rows = [
+            {"tag_id": tag_id, "media_count": delta, "last_used_at": self.when if delta > 0 else None}
+            for tag_id, (_, delta) in self._deltas.items()
+            if delta
+        ]
+        if not rows:
+            return
+        dialect_insert = upsert_insert(session)
+        if dialect_insert is not None:
+            statement = dialect_insert(TagStat)
+            await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[TagStat.tag_id],
+                    set_={
+                        "media_count": TagStat.media_count + statement.excluded.media_count,
+                        "last_used_at": func.coalesce(
+                            statement.excluded.last_used_at, TagStat.last_used_at
+                        ),
+                    },
+                ),
+                rows,
+            )
+            return
+        for row in rows:
+            result = await session.execute(
+                update(TagStat)
+                .where(TagStat.tag_id == row["tag_id"])
+                .values(
+                    media_count=TagStat.media_count + row["media_count"],
+                    last_used_at=func.coalesce(row["last_used_at"], TagStat.last_used_at),
+                )
+            )
+            if result.rowcount == 0:
+                session.add(TagStat(**row))
+
+    def publish(self) -> None:
+        for name, delta in self._deltas.values():
+            if delta:
+                tag_index.apply(name, delta, self.when)
+
+
+async def tag_delta_for_media(
+    session: AsyncSession,
+    media_ids: list[int],
+    step: int,
+    approved: bool = True,
+) -> TagDelta:
+    delta = TagDelta()
+    result = await session.execute(
+        select(Tag.id, Tag.name)
+        .join(MediaTag, MediaTag.tag_id == Tag.id)
+        .join(MediaContent, MediaContent.id == MediaTag.media_id)
+        .where(MediaTag.media_id.in_(media_ids), MediaContent.is_approved.is_(approved))
+    )
+    # A tag appears once per media row it belongs to, so repeats are intended.
+    for tag in result:
+        delta.add([tag], step)
+    return delta
+
+
+async def rebuild_tag_stats() -> int:
+    counts = (
+        select(
+            MediaTag.tag_id,
+            func.count(MediaTag.media_id).label("media_count"),
+            func.max(MediaContent.created_at).label("last_used_at"),
+        )
+        .join(MediaContent, MediaContent.id == MediaTag.media_id)
+        .where(MediaContent.is_approved.is_(True))
+        .group_by(MediaTag.tag_id)
+    )
+    async_session = get_session()
+    async with async_session() as session:
+        await session.execute(delete(TagStat))
+        rows = [row._asdict() for row in await session.execute(counts)]
+        if rows:
+            session.add_all(TagStat(**row) for row in rows)
+        await session.commit()
+    logger.info("Rebuilt statistics for %s tags", len(rows))
+    return len(rows)
+
+
+async def load_tag_index() -> int:
+    async_session = get_read_session()
+    async with async_session() as session:
+        if await session.scalar(select(func.count()).select_from(TagStat)) == 0:
+            has_links = await session.scalar(select(MediaTag.id).limit(1))
+        else:
+            has_links = None
+    if has_links is not None:
+        await rebuild_tag_stats()
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(Tag.name, TagStat.media_count, TagStat.last_used_at)
+            .join(TagStat, TagStat.tag_id == Tag.id)
+        )
+        tag_index.load(result.all())
+    return len(tag_index)
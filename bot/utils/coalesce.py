@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from bot.utils.metrics import metrics
+
+
+class LatestOnly:
+    def __init__(self, name: str, delay: float = 0.0) -> None:
+        self.name = name
+        self.delay = delay
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> bool:
+        previous = self._tasks.get(key)
+        if previous is not None and not previous.done():
+            previous.cancel()
+
+        task = asyncio.create_task(self._delayed(factory))
+        self._tasks[key] = task
+        try:
+            await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if task.cancelled() and (current is None or not current.cancelling()):
+                metrics.inc(f"{self.name}.superseded")
+                return False
+            raise
+        finally:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        metrics.inc(f"{self.name}.rendered")
+        return True
+
+    async def _delayed(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        # A short pause lets a burst of taps collapse before any work starts.
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return await factory()
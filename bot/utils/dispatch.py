@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable
+
+
+Route = Callable[..., Awaitable[Any]]
+
+
+class TextRoutes:
+    def __init__(self) -> None:
+        self._routes: dict[str, Route] = {}
+
+    def __call__(self, text: str) -> Callable[[Route], Route]:
+        def decorator(route: Route) -> Route:
+            if text in self._routes:
+                raise ValueError(f"Duplicate text route: {text!r}")
+            self._routes[text] = route
+            return route
+
+        return decorator
+
+    def __contains__(self, text: object) -> bool:
+        return text in self._routes
+
+    def match(self, text: str | None) -> Route | None:
+        if not text:
+            return None
+        return self._routes.get(text)
+
+    def filter(self, message: Any) -> bool | dict[str, Any]:
+        route = self.match(message.text)
+        if route is None:
+            return False
+        return {"route": route}
+
+
+class CallbackRoutes:
+    def __init__(self, separator: str = ":") -> None:
+        self._separator = separator
+        self._routes: dict[str, Route] = {}
+
+    def __call__(self, prefix: str) -> Callable[[Route], Route]:
+        def decorator(route: Route) -> Route:
+            if prefix in self._routes:
+                raise ValueError(f"Duplicate callback route: {prefix!r}")
+            self._routes[prefix] = route
+            return route
+
+        return decorator
+
+    def match(self, data: str | None) -> tuple[Route, str] | None:
+        if not data:
+            return None
+        prefix, _, payload = data.partition(self._separator)
+        route = self._routes.get(prefix)
+        if route is None:
+            return None
+        return route, payload
+
+    def filter(self, callback: Any) -> bool | dict[str, Any]:
+        matched = self.match(callback.data)
+        if matched is None:
+            return False
+        route, payload = matched
+        return {"route": route, "payload": payload}
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 
+MAX_ID_SPEC = 100_000
+ID_SPEC_SEPARATOR = re.compile(r"[,\s]+")
+
+
 @dataclass
 class FilterArgs:
     tags: list[str]
@@ -49,3 +54,23 @@ def _parse_date(value: str) -> datetime | None:
             continue
     return None
 
+
+def parse_id_spec(raw: str) -> list[int] | None:
+    parts = [part for part in ID_SPEC_SEPARATOR.split(raw.strip()) if part]
+    if not parts:
+        return None
+    ids: set[int] = set()
+    for part in parts:
+        if part.isdigit():
+            ids.add(int(part))
+            continue
+        start, sep, end = part.partition("-")
+        if not (sep and start.isdigit() and end.isdigit()):
+            return None
+        low, high = sorted((int(start), int(end)))
+        if high - low + 1 > MAX_ID_SPEC:
+            raise ValueError(f"Range {part} is longer than {MAX_ID_SPEC} ids")
+        ids.update(range(low, high + 1))
+    if len(ids) > MAX_ID_SPEC:
+        raise ValueError(f"More than {MAX_ID_SPEC} ids")
+    return sorted(ids)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+async def run_periodically(name: str, interval: float, job: Job, initial_delay: float | None = None) -> None:
+    await asyncio.sleep(interval if initial_delay is None else initial_delay)
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Periodic job %s failed", name)
+        await asyncio.sleep(interval)
+
+
+class BackgroundTasks:
+    def __init__(self) -> None:
+        self._tasks: list[asyncio.Task] = []
+
+    def every(self, name: str, interval: float, job: Job, initial_delay: float | None = None) -> None:
+        if interval <= 0:
+            return
+        task = asyncio.create_task(
+            run_periodically(name, interval, job, initial_delay),
+            name=name,
+        )
+        self._tasks.append(task)
+
+    def spawn(self, name: str, coro: Awaitable[Any]) -> None:
+        self._tasks.append(asyncio.create_task(coro, name=name))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+from collections import Counter
+
+from sqlalchemy import Integer, bindparam, column, update, values
+
+from bot.db.dialect import dialect_name
+from bot.db.models import MediaContent
+from bot.db.session import get_session
+
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self) -> None:
+        self._pending: Counter[int] = Counter()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, media_id: int) -> None:
+        self._pending[media_id] += 1
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, Counter()
+        rows = sorted(pending.items())
+        try:
+            async_session = get_session()
+            async with async_session() as session:
+                if dialect_name(session) == "postgresql":
+                    counts = values(
+                        column("media_id", Integer),
+                        column("views", Integer),
+                        name="counts",
+                    ).data(rows)
+                    await session.execute(
+                        update(MediaContent)
+                        .where(MediaContent.id == counts.c.media_id)
+                        .values(view_count=MediaContent.view_count + counts.c.views),
+                        execution_options={"synchronize_session": False},
+                    )
+                else:
+                    # SQLite has no column aliases for VALUES; one executemany instead.
+                    table = MediaContent.__table__
+                    await session.execute(
+                        update(table)
+                        .where(table.c.id == bindparam("media_id"))
+                        .values(view_count=table.c.view_count + bindparam("views")),
+                        [{"media_id": media_id, "views": views} for media_id, views in rows],
+                    )
+                await session.commit()
+        except Exception:
+            # Keep the counts for the next flush instead of dropping them.
+            self._pending.update(pending)
+            raise
+        logger.debug("Flushed views for %s media", len(rows))
+        return len(rows)
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from bot.config import get_settings
+from bot.db.catalog import count_media, load_browse_page, load_tag_ids
+from bot.db.session import get_read_session
+from bot.handlers.gallery import GALLERY_PAGE_SIZE, GALLERY_PREVIEW
+from bot.handlers.query import BROWSE_PAGE_SIZE, BROWSE_PREVIEW
+from bot.similarity import load_similarity_index
+from bot.tag_stats import load_tag_index
+
+
+logger = logging.getLogger(__name__)
+
+WARM_BROWSE_PAGES = 5
+
+
+async def prewarm_pool(engine: AsyncEngine, connections: int | None = None) -> None:
+    if connections is None:
+        connections = engine.pool.size() if hasattr(engine.pool, "size") else 1
+
+    async def ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+async def warm_up() -> None:
+    settings = get_settings()
+    only_approved = settings.moderation_enabled
+    async_session = get_read_session()
+    async with async_session() as session:
+        tags = await load_tag_ids(session)
+        total = await count_media(session, only_approved)
+        if only_approved:
+            await count_media(session, False)
+        for page in range(1, WARM_BROWSE_PAGES + 1):
+            if (page - 1) * BROWSE_PAGE_SIZE >= total:
+                break
+            await load_browse_page(session, page, BROWSE_PAGE_SIZE, only_approved, preview=BROWSE_PREVIEW)
+        await load_browse_page(session, 1, GALLERY_PAGE_SIZE, only_approved, preview=GALLERY_PREVIEW)
+    indexed = await load_tag_index()
+    similar = await load_similarity_index()
+    logger.info(
+        "Warmed %s tag ids, %s tag stats, %s media rows counted, %s descriptions indexed",
+        tags,
+        indexed,
+        total,
+        similar,
+    )
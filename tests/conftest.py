@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bot.cache import invalidate_media, invalidate_tags  # noqa: E402
+from bot.db import session as db_session  # noqa: E402
+
+
+class FakeMessage:
+    def __init__(self, text: str = "", user_id: int = 1) -> None:
+        self.text = text
+        self.from_user = SimpleNamespace(id=user_id)
+        self.chat = SimpleNamespace(id=1)
+        self.message_id = 1
+        self.sent: list[tuple[str, object]] = []
+
+    async def answer(self, text, **kwargs):
+        self.sent.append(("text", text))
+
+    async def answer_photo(self, photo, **kwargs):
+        self.sent.append(("photo", photo))
+
+    async def answer_video(self, video, **kwargs):
+        self.sent.append(("video", video))
+
+
+@pytest.fixture
+def settings_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOT_TOKEN", "1:test")
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'bot.sqlite3'}")
+    monkeypatch.setenv("DATABASE_READ_URL", "")
+    monkeypatch.setenv("MODERATION_ENABLED", "false")
+    monkeypatch.setenv("DOWNLOAD_FILES", "false")
+    monkeypatch.setenv("ADMIN_IDS", "")
+    monkeypatch.setattr(db_session, "_read_session_factory", None)
+    monkeypatch.setattr(db_session, "_recent_writes", {})
+    monkeypatch.setattr(db_session, "_last_write", 0.0)
+    invalidate_media()
+    invalidate_tags()
+    yield tmp_path
+    invalidate_media()
+    invalidate_tags()
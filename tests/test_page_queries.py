@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import event
+
+from bot.db.models import MediaContent, MediaTag, MediaVariant, Tag
+from bot.db.session import get_session
+from bot.handlers.query import _run_filter, _send_browse_page, send_ids_page
+from bot.main import init_db
+from bot.utils.parsing import parse_filter_args
+from tests.conftest import FakeMessage
+
+
+MEDIA_COUNT = 25
+
+
+async def seed() -> None:
+    async with get_session()() as session:
+        tags = [Tag(name=f"t{number}") for number in range(3)]
+        session.add_all(tags)
+        for number in range(MEDIA_COUNT):
+            media = MediaContent(
+                telegram_file_id=f"file{number}",
+                telegram_file_unique_id=f"unique{number}",
+                media_type="photo",
+                description=f"item {number}",
+            )
+            session.add(media)
+            await session.flush()
+            session.add(MediaTag(media_id=media.id, tag_id=tags[number % 3].id))
+            for side in (90, 320, 800, 1280):
+                session.add(
+                    MediaVariant(
+                        media_id=media.id,
+                        kind="photo",
+                        telegram_file_id=f"file{number}_{side}",
+                        telegram_file_unique_id=f"unique{number}_{side}",
+                        width=side,
+                        height=side * 3 // 4,
+                    )
+                )
+        await session.commit()
+
+
+def run_counted(scenario) -> list[str]:
+    # aiosqlite connections belong to the loop that opened them, so setup,
+    # the scenario and engine disposal all share one asyncio.run.
+    async def main() -> list[str]:
+        engine, _, _ = await init_db()
+        try:
+            await seed()
+            statements: list[str] = []
+
+            def count(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(engine.sync_engine, "before_cursor_execute", count)
+            await scenario()
+            return statements
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_ids_page_is_one_statement(settings_env):
+    message = FakeMessage("/ids 2")
+    statements = run_counted(lambda: send_ids_page(message, 2))
+
+    assert len(statements) == 1
+    kind, text = message.sent[-1]
+    assert kind == "text"
+    assert "Стр. 2/3" in text
+
+
+def test_filter_with_cold_tag_cache_is_one_statement(settings_env):
+    message = FakeMessage("/filter #t1")
+    statements = run_counted(lambda: _run_filter(message, parse_filter_args("#t1")))
+
+    assert len(statements) == 1
+    _, text = message.sent[-1]
+    assert "item 22" in text
+    assert "item 21" not in text
+
+
+def test_browse_page_is_one_statement(settings_env):
+    message = FakeMessage("/list")
+    statements = run_counted(lambda: _send_browse_page(message, page=1))
+
+    assert len(statements) == 1
+    # The smallest photo size covering the feed width is sent instead of the original.
+    assert message.sent[-1] == ("photo", f"file{MEDIA_COUNT - 1}_800")
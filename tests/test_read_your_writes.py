@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import asyncio
+
+from bot.cache import browse_pages, media_counts
+from bot.db.catalog import load_browse_page
+from bot.db.session import get_read_session, mark_write
+from bot.main import init_db
+from tests.test_page_queries import seed
+
+
+def test_replica_reads_are_not_cached_inside_a_write_window(settings_env, monkeypatch):
+    # A second engine on the same file stands in for the replica.
+    monkeypatch.setenv("DATABASE_READ_URL", f"sqlite+aiosqlite:///{settings_env / 'bot.sqlite3'}")
+
+    async def main() -> None:
+        engine, _, _ = await init_db()
+        try:
+            await seed()
+            mark_write(1)
+
+            async with get_read_session(2)() as session:
+                await load_browse_page(session, 1, 10, only_approved=False)
+            assert len(browse_pages) == 0
+            assert media_counts.get(False) is None
+
+            # The writer reads from the primary, which is safe to share.
+            async with get_read_session(1)() as session:
+                await load_browse_page(session, 1, 10, only_approved=False)
+            assert len(browse_pages) == 1
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())